@@ -0,0 +1,749 @@
+"""
+This script benchmarks process_orca_4 and launch_orca_4 on synthetic orca 4.2.1 outputs, so that parser changes can be trusted.
+It writes a directory of synthetic .out files from templates (opt freq, optTS freq, SP, unconverged, truncated and $new_job jobs),
+then times process_out_files() on it and records the peak memory, and checks the summary and timings .csv against the results the
+generator knows each file should give (the golden set). The costs are checked on a few fixed files whose expected rows were worked out by hand. It does the same for input generation with launch_orca_4 on
+synthetic .xyz files, and checks that launch_orca_4 dedup finds the copies of some of them whose atoms were shuffled, rotated and moved.
+Each measurement runs in a fresh python process so its peak memory is its own.
+
+Results are appended to benchmark_orca_4_results.jsonl (one JSON object per run) together with the versions of the scripts.
+A run is compared to the last run with the same parameters, and slowdowns or memory growth beyond 20% are reported.
+
+Optional arguments:
+    -n N, --files N     number of synthetic .out and .xyz files (default 200)
+    --atoms N           atoms per molecule (default 30)
+    --cycles N          optimization cycles per job (default 10)
+    --size MB           pads each .out file with SCF iterations up to roughly MB megabytes (default 0, no padding)
+    -j N, --workers N   workers passed to process_out_files (default 1)
+    --seed N            seed of the generator (default 0)
+    --directory DIR     where the synthetic files are written (default a temporary directory, deleted afterwards)
+    --keep              keeps the synthetic files
+    --results PATH      history file (default benchmark_orca_4_results.jsonl in the working directory)
+
+The exit status is 1 if the summary does not match the golden set, or if a stage fails or runs longer than an hour.
+"""
+
+#####################
+###Version Control###
+#####################
+
+#(since I will probably not convince the Carrow lab to use Github)
+#Update this value whenever edits are made and add to the Edit History comment.
+
+edit_history = """
+Version Initials    Date            Summary
+1.0     ARS         17-Oct-2026     First draft of the benchmark and synthetic output generator
+1.1     ARS         17-Oct-2026     synthetic outputs report their SCF iterations, which are checked against the timings table
+1.2     ARS         17-Oct-2026     freq jobs print a thermochemistry section (temperature, mass, symmetry number, rotational constants)
+1.3     ARS         17-Oct-2026     a stage which fails or hangs stops the benchmark instead of blocking it
+1.4     ARS         17-Oct-2026     freq jobs print the frequency, normal mode, IR and thermochemistry sections laid out as orca 4.2.1 prints them
+1.5     ARS         17-Oct-2026     checks that dedup finds copies of .xyz files with their atoms shuffled, rotated and moved
+1.6     ARS         17-Oct-2026     the costs of the golden set are fixed values for a few hand-checked files, not recomputed from the parser's logic
+"""
+
+import os
+import sys
+import csv
+import json
+import math
+import time
+import queue
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+SETTINGS_PATH = os.path.join(SCRIPTS_PATH, 'orca_settings')
+RESULTS_FILE = 'benchmark_orca_4_results.jsonl'
+REGRESSION_TOLERANCE = 0.2
+STAGE_TIMEOUT = 3600
+MASSES = {'H': 1.008, 'C': 12.011, 'N': 14.007, 'O': 15.999}
+
+#the kinds of jobs written by the generator, in the proportions they are drawn
+JOB_KINDS = ['opt', 'opt', 'opt', 'optTS', 'SP', 'unconverged', 'truncated', 'new_job']
+COMMANDS = {
+    'opt': '! B3LYP D3 def2-SVP RIJCOSX autoaux opt freq',
+    'optTS': '! B3LYP D3 def2-SVP RIJCOSX autoaux optTS freq',
+    'SP': '! B3LYP D3 def2-TZVPP RIJCOSX autoaux CPCM(Toluene)'}
+
+def random_spec(name, atoms, cycles, pad_lines, rng):
+    """
+    Draws the contents of one synthetic .out file.
+    Returns a dictionary describing the file: its jobs (commands, cycles, energies, frequencies, timings),
+    the elements of the molecule, the cores and %maxcore, and whether it terminated.
+    """
+    kind = rng.choice(JOB_KINDS)
+    if kind == 'new_job':
+        kinds = ['opt', 'SP']
+    elif kind in ('unconverged', 'truncated'):
+        kinds = ['opt']
+    else:
+        kinds = [kind]
+
+    jobs = []
+    for job_kind in kinds:
+        freq = 'freq' in COMMANDS[job_kind]
+        n_cycles = 1 if job_kind == 'SP' else rng.randint(max(1, cycles // 2), cycles)
+        frequencies = []
+        if freq:
+            n_negative = 1 if job_kind == 'optTS' else rng.choice([0, 0, 0, 1])
+            frequencies = [round(-rng.uniform(20, 800), 2) for n in range(n_negative)]
+            frequencies += sorted(round(rng.uniform(30, 3500), 2) for n in range(3 * atoms - 6 - n_negative))
+        jobs.append({
+            'commands': COMMANDS[job_kind],
+            'job type': job_kind,
+            'cycles': n_cycles,
+            'converged': job_kind != 'SP' and kind != 'unconverged' and kind != 'truncated',
+            'energies': [f'{-rng.uniform(100, 3000) - 0.001 * n:.9f}' for n in range(n_cycles)],
+            'scf iterations': [rng.randint(6, 30) for n in range(n_cycles)],
+            'frequencies': frequencies if kind != 'truncated' else [],
+            'H': f'{-rng.uniform(100, 3000):.8f}',
+            'G': f'{-rng.uniform(100, 3000):.8f}',
+            'time': round(rng.uniform(10, 5000), 3)})
+
+    n_heavy = max(1, atoms // 2)
+    elements = [rng.choice(['C', 'C', 'C', 'N', 'O']) for n in range(n_heavy)] + ['H'] * (atoms - n_heavy)
+    run_time = [rng.randint(0, 2), rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59)]
+    return {
+        'name': name,
+        'jobs': jobs,
+        'elements': elements,
+        'nprocs': rng.choice([8, 12, 16]),
+        'maxcore': rng.choice([1000, 1500, 2000]),
+        'terminated': kind != 'truncated',
+        'run time': run_time,
+        'pad lines': pad_lines}
+
+def out_lines(spec, rng):
+    """yields the lines of a synthetic orca 4.2.1 .out file, so that very large files are never held in memory"""
+    yield '                                 *****************'
+    yield '                                 * O   R   C   A *'
+    yield '                                 *****************'
+    yield ''
+    yield '                           Program Version 4.2.1 -  RELEASE  -'
+    yield ''
+    yield '================================================================================'
+    yield '                                       INPUT FILE'
+    yield '================================================================================'
+    yield f'NAME = {spec["name"]}.inp'
+    inp = []
+    for n, job in enumerate(spec['jobs']):
+        if n > 0:
+            inp.append('$new_job')
+        inp += [job['commands'], f'%pal nprocs {spec["nprocs"]} end', f'%maxcore {spec["maxcore"]}',
+                f'* xyzfile 0 1 {spec["name"]}_in.xyz', '']
+    inp.append('# This input file was created with launch_orca_4_v3_20.py version 3.20')
+    for n, line in enumerate(inp, start=1):
+        yield f'|{n:3d}> {line}'
+    yield f'|{len(inp) + 1:3d}>                          ****END OF INPUT****'
+    yield '================================================================================'
+    yield ''
+
+    for n, job in enumerate(spec['jobs']):
+        last_job = n == len(spec['jobs']) - 1
+        if n > 0:
+            yield ''
+            yield f'                         $$$$$$$$$$$$$$$$  JOB NUMBER  {n + 1} $$$$$$$$$$$$$$'
+            yield ''
+        for cycle, (energy, iterations) in enumerate(zip(job['energies'], job['scf iterations']), start=1):
+            if job['job type'] != 'SP':
+                yield '                         *****************************************************'
+                yield f'                         *               GEOMETRY OPTIMIZATION CYCLE {cycle:3d}      *'
+                yield '                         *****************************************************'
+            yield '---------------------------------'
+            yield 'CARTESIAN COORDINATES (ANGSTROEM)'
+            yield '---------------------------------'
+            for element in spec['elements']:
+                yield f'  {element:2}    {rng.uniform(-5, 5):12.6f}  {rng.uniform(-5, 5):12.6f}  {rng.uniform(-5, 5):12.6f}'
+            yield ''
+            yield '                       ----------------------------'
+            yield '                       |    SCF ITERATIONS        |'
+            yield '                       ----------------------------'
+            for iteration in range(spec['pad lines']):
+                yield f'  {iteration:3d}   {float(energy) + 1 / (iteration + 2):.12f}   {1e-3 / (iteration + 1):.8e}  0.00123456  0.00456789'
+            yield '               *****************************************************'
+            yield '               *                     SUCCESS                       *'
+            yield f'               *           SCF CONVERGED AFTER {iterations:3d} CYCLES          *'
+            yield '               *****************************************************'
+            yield f'Total Energy       :         {energy} Eh          {float(energy) * 27.2114:.5f} eV'
+            yield 'Total SCF time: 0 days 0 hours 1 min 5 sec'
+            yield '-------------------------   --------------------'
+            yield f'FINAL SINGLE POINT ENERGY       {energy}'
+            yield '-------------------------   --------------------'
+            if job['job type'] != 'SP':
+                yield '          MAX gradient        0.004513  0.000300      NO'
+        if job['converged']:
+            yield '                    ***********************HURRAY********************'
+            yield '                    ***        THE OPTIMIZATION HAS CONVERGED     ***'
+            yield '                    *************************************************'
+        if last_job and not spec['terminated']:
+            #the job is killed in the middle of an SCF
+            yield '  12   -100.123456789012   1.2e-05  0.00123456  0.00456789'
+            return
+        if job['frequencies']:
+            yield from freq_lines(spec, job)
+        yield ''
+        yield 'Timings for individual modules:'
+        yield ''
+        yield f'Sum of individual times         ...     {job["time"]:9.3f} sec (={job["time"] / 60:10.3f} min)'
+        yield f'SCF iterations                  ...     {job["time"] * 0.6:9.3f} sec (={job["time"] * 0.01:10.3f} min)  60.0 %'
+        yield f'SCF Gradient evaluation         ...     {job["time"] * 0.4:9.3f} sec (={job["time"] / 150:10.3f} min)  40.0 %'
+    yield '                             ****ORCA TERMINATED NORMALLY****'
+    days, hours, minutes, seconds = spec['run time']
+    yield f'TOTAL RUN TIME: {days} days {hours} hours {minutes} minutes {seconds} seconds 450 msec'
+
+def freq_lines(spec, job):
+    """yields the frequency and thermochemistry sections of a freq job, laid out as orca 4.2.1 prints them
+    the values which are not in the golden set are derived from the molecule and H and G, so no random numbers are drawn"""
+    n_atoms = len(spec['elements'])
+    frequencies = [0.0] * 6 + job['frequencies']
+    yield 'Writing the Hessian file to the disk             ... done'
+    yield ''
+    yield 'Total SCF Hessian time: 0 days 0 hours 2 min 13 sec'
+    yield ''
+    yield ''
+    yield '-----------------------'
+    yield 'VIBRATIONAL FREQUENCIES'
+    yield '-----------------------'
+    yield ''
+    yield 'Scaling factor for frequencies =  1.000000000  (already applied!)'
+    yield ''
+    for mode, frequency in enumerate(frequencies):
+        yield f'  {mode:3d}:   {frequency:10.2f} cm**-1' + ('   ***imaginary mode***' if frequency < 0 else '')
+    yield ''
+    yield ''
+    yield '------------'
+    yield 'NORMAL MODES'
+    yield '------------'
+    yield ''
+    yield 'These modes are the cartesian displacements weighted by the diagonal matrix'
+    yield 'M(i,i)=1/sqrt(m[i]) where m[i] is the mass of the displaced atom'
+    yield 'Thus, these vectors are normalized but *not* orthogonal'
+    yield ''
+    for first in range(0, len(frequencies), 6):
+        columns = range(first, min(first + 6, len(frequencies)))
+        yield '                 ' + ''.join(f'{column:6d}     ' for column in columns)
+        for row in range(len(frequencies)):
+            yield f'      {row:3d}   ' + ''.join(f'{0 if column < 6 else ((row * 7 + column * 3) % 17 - 8) / 40:11.6f}' for column in columns)
+    yield ''
+    yield ''
+    yield '-----------'
+    yield 'IR SPECTRUM'
+    yield '-----------'
+    yield ''
+    yield ' Mode    freq (cm**-1)   T**2         TX         TY         TZ'
+    yield '-------------------------------------------------------------------'
+    for mode, frequency in enumerate(frequencies[6:], start=6):
+        yield f'  {mode:3d}:   {frequency:10.2f}   {(mode % 13) * 3.217:10.6f}  ( {0.1:9.6f} {-0.2:9.6f} {0.05:9.6f})'
+    yield ''
+    yield 'The first frequency considered to be a vibration is 6'
+    yield f'The total number of vibrations considered is {len(frequencies) - 6}'
+    yield ''
+    yield ''
+    yield '--------------------------'
+    yield 'THERMOCHEMISTRY AT 298.15K'
+    yield '--------------------------'
+    yield ''
+    yield 'Temperature         ... 298.15 K'
+    yield 'Pressure            ... 1.00 atm'
+    yield f'Total Mass          ... {sum(MASSES[element] for element in spec["elements"]):.2f} AMU'
+    yield ''
+    yield 'Throughout the following assumptions are being made:'
+    yield '  (1) The electronic state is orbitally nondegenerate'
+    yield '  (2) There are no thermally accessible electronically excited states'
+    yield '  (3) Hindered rotations indicated by low frequency modes are not'
+    yield '      treated as such but are treated as vibrations and this may'
+    yield '      cause some error'
+    yield '  (4) All equations used are the standard statistical mechanics'
+    yield '      equations for an ideal gas'
+    yield '  (5) All vibrations are strictly harmonic'
+    yield ''
+    for frequency in job['frequencies']:
+        if frequency > 0:
+            yield f'freq. {frequency:10.2f}  E(vib)   ...       {0.59 / (1 + frequency / 200):.2f} '
+    yield ''
+    yield '------------'
+    yield 'INNER ENERGY'
+    yield '------------'
+    yield ''
+    yield 'The inner energy is: U= E(el) + E(ZPE) + E(vib) + E(rot) + E(trans)'
+    yield '     E(el)   - is the total energy from the electronic structure calculation'
+    yield '              = E(kin-el) + E(nuc-el) + E(el-el) + E(nuc-nuc)'
+    yield '     E(ZPE)  - the the zero temperature vibrational energy from the frequency calculation'
+    yield '     E(vib)  - the the finite temperature correction to E(ZPE) due to population'
+    yield '               of excited vibrational states'
+    yield '     E(rot)  - is the rotational thermal energy'
+    yield '     E(trans)- is the translational thermal energy'
+    yield ''
+    #a consistent breakdown of the drawn H and G, in Eh
+    kT = 0.00094421
+    electronic = float(job['energies'][-1])
+    thermal = float(job['H']) - kT
+    zpe = sum(frequency for frequency in job['frequencies'] if frequency > 0) / 2 / 219474.63
+    rotational = translational = 1.5 * kT
+    vibrational = thermal - electronic - zpe - rotational - translational
+    entropy = float(job['H']) - float(job['G'])
+    yield 'Summary of contributions to the inner energy U:'
+    yield f'Electronic energy                ... {electronic:15.8f} Eh'
+    for label, value in (('Zero point energy               ', zpe), ('Thermal vibrational correction  ', vibrational),
+                         ('Thermal rotational correction   ', rotational), ('Thermal translational correction', translational)):
+        yield f'{label} ... {value:15.8f} Eh {value * 627.509:10.2f} kcal/mol'
+    yield '-----------------------------------------------------------------------'
+    yield f'Total thermal energy                {thermal:15.8f} Eh'
+    yield ''
+    yield ''
+    yield 'Summary of corrections to the electronic energy:'
+    yield '(perhaps to be used in another calculation)'
+    yield f'Total thermal correction            {vibrational + rotational + translational:15.8f} Eh {(vibrational + rotational + translational) * 627.509:10.2f} kcal/mol'
+    yield f'Non-thermal (ZPE) correction        {zpe:15.8f} Eh {zpe * 627.509:10.2f} kcal/mol'
+    yield '-----------------------------------------------------------------------'
+    yield f'Total correction                    {thermal - electronic:15.8f} Eh {(thermal - electronic) * 627.509:10.2f} kcal/mol'
+    yield ''
+    yield ''
+    yield '--------'
+    yield 'ENTHALPY'
+    yield '--------'
+    yield ''
+    yield 'The enthalpy is H = U + kB*T'
+    yield f'                kB*T = {kT:.8f} Eh'
+    yield ''
+    yield f'Total free energy                 ... {thermal:15.8f} Eh'
+    yield f'Thermal Enthalpy correction       ... {kT:15.8f} Eh {kT * 627.509:10.2f} kcal/mol'
+    yield '-----------------------------------------------------------------------'
+    yield f'Total Enthalpy                    ...    {job["H"]} Eh'
+    yield ''
+    yield ''
+    yield 'Note: Rotational entropy computed according to Herzberg '
+    yield 'Infrared and Raman Spectra, Chapter V,1, Van Nostrand Reinhold, 1945 '
+    yield 'Point Group:  C1, Symmetry Number:   1  '
+    yield f'Rotational constants in cm-1: {30 / n_atoms**1.5:12.6f} {20 / n_atoms**1.5:12.6f} {15 / n_atoms**1.5:12.6f} '
+    yield ''
+    yield 'Vibrational entropy computed according to the QRRHO of S. Grimme'
+    yield 'Chem.Eur.J. 2012 18 9955'
+    yield ''
+    yield ''
+    yield '-------'
+    yield 'ENTROPY'
+    yield '-------'
+    yield ''
+    yield 'The entropy contributions are T*S = T*(S(el)+S(vib)+S(rot)+S(trans))'
+    yield '     S(el)   - electronic entropy'
+    yield '     S(vib)  - vibrational entropy'
+    yield '     S(rot)  - rotational entropy'
+    yield '     S(trans)- translational entropy'
+    yield 'The entropies will be listed as multiplied by the temperature to get'
+    yield 'units of energy'
+    yield ''
+    yield f'Electronic entropy                ... {0:15.8f} Eh {0:10.2f} kcal/mol'
+    for label, share in (('Vibrational entropy  ', 0.5), ('Rotational entropy   ', 0.2), ('Translational entropy', 0.3)):
+        yield f'{label}             ... {entropy * share:15.8f} Eh {entropy * share * 627.509:10.2f} kcal/mol'
+    yield '-----------------------------------------------------------------------'
+    yield f'Final entropy term                ... {entropy:15.8f} Eh {entropy * 627.509:10.2f} kcal/mol'
+    yield ''
+    yield ''
+    yield '-------------------'
+    yield 'GIBBS FREE ENERGY'
+    yield '-------------------'
+    yield ''
+    yield 'The Gibbs free energy is G = H - T*S'
+    yield ''
+    yield f'Total enthalpy                    ...    {job["H"]} Eh'
+    yield f'Total entropy correction          ... {-entropy:15.8f} Eh {-entropy * 627.509:10.2f} kcal/mol'
+    yield '-----------------------------------------------------------------------'
+    yield f'Final Gibbs free energy         ...    {job["G"]} Eh'
+    yield ''
+    yield 'For completeness - the Gibbs free enthalpy minus the electronic energy'
+    yield f'G-E(el)                           ... {float(job["G"]) - electronic:15.8f} Eh {(float(job["G"]) - electronic) * 627.509:10.2f} kcal/mol'
+
+def golden_job(kind, energies, scf_iterations, frequencies=(), H='', G='', time=600.0, converged=True):
+    """one job of a golden case, in the form random_spec draws them"""
+    return {'commands': COMMANDS[kind], 'job type': kind, 'cycles': len(energies), 'converged': converged and kind != 'SP',
+            'energies': energies, 'scf iterations': scf_iterations, 'frequencies': list(frequencies), 'H': H, 'G': G, 'time': time}
+
+def golden_specs():
+    """the fixed golden cases, one of each kind of file (plus a $new_job file cut off in its second job), whose rows are in GOLDEN_ROWS"""
+    frequencies = [1180.5, 1250.25, 1500.0, 1750.75, 2850.0, 2900.5]
+    cases = [
+        ('golden_opt_0_1', 12, [0, 2, 30, 0], True,
+         [golden_job('opt', ['-114.500000000', '-114.510000000', '-114.512345678'], [12, 8, 6], frequencies, '-114.48000000', '-114.50500000', 1200.0)]),
+        ('golden_optts_0_1', 8, [1, 0, 0, 0], True,
+         [golden_job('optTS', ['-114.400000000', '-114.401000000'], [20, 15], [-512.3] + frequencies[1:], '-114.37000000', '-114.39500000', 3000.0)]),
+        ('golden_sp_0_1', 16, [0, 0, 45, 0], True,
+         [golden_job('SP', ['-114.600000000'], [14])]),
+        ('golden_unconverged_0_1', 12, [0, 1, 0, 0], True,
+         [golden_job('opt', ['-114.300000000', '-114.305000000'], [10, 9], frequencies, '-114.28000000', '-114.30100000', 900.0, converged=False)]),
+        ('golden_truncated_0_1', 16, [0, 0, 0, 0], False,
+         [golden_job('opt', ['-114.200000000', '-114.210000000'], [11, 7], time=500.0, converged=False)]),
+        ('golden_newjob_0_1', 12, [0, 3, 0, 0], True,
+         [golden_job('opt', ['-114.500000000', '-114.512000000'], [9, 5], frequencies, '-114.48100000', '-114.50600000', 2700.0),
+          golden_job('SP', ['-114.650000000'], [16], time=900.0)]),
+        ('golden_newjob_truncated_0_1', 8, [0, 0, 0, 0], False,
+         [golden_job('opt', ['-114.500000000'], [10], frequencies, '-114.47000000', '-114.49000000', 1800.0),
+          golden_job('SP', ['-114.640000000'], [12], time=100.0)])]
+    return [{'name': name, 'jobs': jobs, 'elements': ['C', 'O', 'H', 'H'], 'nprocs': nprocs, 'maxcore': 1000, 'terminated': terminated,
+             'run time': run_time, 'pad lines': 0} for name, nprocs, run_time, terminated, jobs in cases]
+
+#the rows process_orca_4 must write for golden_specs(), worked out by hand rather than by the logic of the parser:
+#a single job costs nprocs * TOTAL RUN TIME, the jobs of a $new_job file split it in proportion to their 'Sum of individual times',
+#and a finished job of a file that was cut off costs nprocs * its own 'Sum of individual times'
+GOLDEN_COLUMNS = ['molecule name', 'command line', 'job type', 'freq?', 'cost (cpu*hr)', 'E (a.u.)', 'H (a.u.)', 'G (a.u.)',
+                  'neg freq (cm^-1)', 'geom converged?', 'opt cycles', 'SCF iterations']
+GOLDEN_ROWS = [dict(zip(GOLDEN_COLUMNS, row)) for row in [
+    #12 cores * 2.5 h
+    ['golden_opt_0_1', '! b3lyp d3 def2-svp rijcosx autoaux opt freq', 'opt', 'True', '30.0',
+     '-114.512345678', '-114.48000000', '-114.50500000', '[]', 'True', '3', '26'],
+    #8 cores * 24 h
+    ['golden_optts_0_1', '! b3lyp d3 def2-svp rijcosx autoaux optts freq', 'optTS', 'True', '192.0',
+     '-114.401000000', '-114.37000000', '-114.39500000', '[-512.3]', 'True', '2', '35'],
+    #16 cores * 0.75 h
+    ['golden_sp_0_1', '! b3lyp d3 def2-tzvpp rijcosx autoaux cpcm(toluene)', 'SP', 'False', '12.0',
+     '-114.600000000', '', '', '', '', '', '14'],
+    #12 cores * 1 h
+    ['golden_unconverged_0_1', '! b3lyp d3 def2-svp rijcosx autoaux opt freq', 'opt', 'True', '12.0',
+     '-114.305000000', '-114.28000000', '-114.30100000', '[]', 'False', '2', '19'],
+    #no TOTAL RUN TIME and no frequencies
+    ['golden_truncated_0_1', '! b3lyp d3 def2-svp rijcosx autoaux opt freq', 'opt', 'True', 'N/A',
+     '-114.210000000', '', '', '[]', 'False', '2', '18'],
+    #12 cores * 3 h split 2700:900
+    ['golden_newjob_0_1_job1', '! b3lyp d3 def2-svp rijcosx autoaux opt freq', 'opt', 'True', '27.0',
+     '-114.512000000', '-114.48100000', '-114.50600000', '[]', 'True', '2', '14'],
+    ['golden_newjob_0_1_job2', '! b3lyp d3 def2-tzvpp rijcosx autoaux cpcm(toluene)', 'SP', 'False', '9.0',
+     '-114.650000000', '', '', '', '', '', '16'],
+    #8 cores * 1800 s, and the SP was cut off
+    ['golden_newjob_truncated_0_1_job1', '! b3lyp d3 def2-svp rijcosx autoaux opt freq', 'opt', 'True', '4.0',
+     '-114.500000000', '-114.47000000', '-114.49000000', '[]', 'True', '1', '10'],
+    ['golden_newjob_truncated_0_1_job2', '! b3lyp d3 def2-tzvpp rijcosx autoaux cpcm(toluene)', 'SP', 'False', 'N/A',
+     '-114.640000000', '', '', '', '', '', '12']]]
+
+def expected_rows(spec):
+    """the rows process_orca_4 should write for a random synthetic file, as the strings they appear as in the .csv files
+    (the summary and the opt cycles and SCF iterations of the timings table).
+    Only the values the generator wrote into the file are checked. The cost is left out, since working it out here would
+    repeat the logic of the parser; it is checked on the golden cases (GOLDEN_ROWS) instead"""
+    jobs = spec['jobs']
+    rows = []
+    for n, job in enumerate(jobs):
+        name = spec['name'] if len(jobs) == 1 else f'{spec["name"]}_job{n + 1}'
+        freq = 'freq' in job['commands']
+        truncated = not spec['terminated'] and n == len(jobs) - 1
+        if freq:
+            H, G = ('', '') if truncated or not job['frequencies'] else (job['H'], job['G'])
+            neg_freqs = [frequency for frequency in job['frequencies'] if frequency < 0]
+        else:
+            H, G, neg_freqs = '', '', ''
+        converged = job['converged'] if job['job type'] != 'SP' else ''
+        cycles = job['cycles'] if job['job type'] != 'SP' else ''
+
+        rows.append({'molecule name': name, 'command line': job['commands'].lower(), 'job type': job['job type'],
+                     'freq?': str(freq), 'E (a.u.)': job['energies'][-1],
+                     'H (a.u.)': H, 'G (a.u.)': G, 'neg freq (cm^-1)': str(neg_freqs), 'geom converged?': str(converged),
+                     'opt cycles': str(cycles), 'SCF iterations': str(sum(job['scf iterations']))})
+    return rows
+
+def write_out_files(directory, n_files, atoms, cycles, size, seed):
+    """
+    Writes n_files synthetic .out files and the golden cases to directory and returns the golden set, {molecule name: {column: value}}.
+    size (in MB) sets how many SCF iteration lines pad each geometry so the files reach roughly that size.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    #roughly 70 bytes per SCF iteration line
+    pad_lines = 0
+    if size > 0:
+        pad_lines = int(size * 1e6 / 70 / max(1, cycles * 3 // 4))
+
+    golden = {}
+    for n in range(n_files):
+        name = f'mol{n:05d}_0_1'
+        spec = random_spec(name, atoms, cycles, pad_lines, rng)
+        with open(os.path.join(directory, f'{name}.out'), 'w') as file:
+            for line in out_lines(spec, rng):
+                file.write(line + '\n')
+        for row in expected_rows(spec):
+            golden[row['molecule name']] = row
+
+    #the golden cases draw from their own generator, so the random files do not depend on them
+    golden_rng = random.Random(seed)
+    for spec in golden_specs():
+        with open(os.path.join(directory, f'{spec["name"]}.out'), 'w') as file:
+            for line in out_lines(spec, golden_rng):
+                file.write(line + '\n')
+    for row in GOLDEN_ROWS:
+        golden[row['molecule name']] = row
+    return golden
+
+def write_xyz_files(directory, n_files, atoms, seed):
+    """writes n_files synthetic .xyz files named {molecule_name}_{charge}_{spin}.xyz for launch_orca_4"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    for n in range(n_files):
+        n_heavy = max(1, atoms // 2)
+        elements = [rng.choice(['C', 'C', 'C', 'N', 'O']) for m in range(n_heavy)] + ['H'] * (atoms - n_heavy)
+        with open(os.path.join(directory, f'mol{n:05d}_0_1.xyz'), 'w') as file:
+            file.write(f'{atoms}\nsynthetic molecule {n}\n')
+            for element in elements:
+                file.write(f'{element}  {rng.uniform(-5, 5):.6f}  {rng.uniform(-5, 5):.6f}  {rng.uniform(-5, 5):.6f}\n')
+
+def write_duplicate_files(directory, n_files, atoms, seed):
+    """writes n_files synthetic .xyz files and a copy of every other one, with its atoms in another order, rotated, translated
+    and each moved by up to 0.005 angstroms, and returns {copy: original}, the duplicates launch_orca_4 dedup should find"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    copies = {}
+    for n in range(n_files):
+        n_heavy = max(1, atoms // 2)
+        atoms_list = [(rng.choice(['C', 'C', 'C', 'N', 'O']), [rng.uniform(-5, 5) for k in range(3)]) for m in range(n_heavy)]
+        atoms_list += [('H', [rng.uniform(-5, 5) for k in range(3)]) for m in range(atoms - n_heavy)]
+        files = [(f'dup{n:05d}_0_1', atoms_list)]
+        if n % 2 == 0:
+            #a rotation about a random axis by a random angle (Rodrigues), followed by a translation
+            axis = [rng.gauss(0, 1) for k in range(3)]
+            norm = sum(x**2 for x in axis)**0.5
+            x, y, z = (component / norm for component in axis)
+            angle = rng.uniform(0, 2 * math.pi)
+            c, s = math.cos(angle), math.sin(angle)
+            rotation = [[c + x*x*(1 - c), x*y*(1 - c) - z*s, x*z*(1 - c) + y*s],
+                        [y*x*(1 - c) + z*s, c + y*y*(1 - c), y*z*(1 - c) - x*s],
+                        [z*x*(1 - c) - y*s, z*y*(1 - c) + x*s, c + z*z*(1 - c)]]
+            shift = [rng.uniform(-10, 10) for k in range(3)]
+            moved = [(element, [sum(rotation[k][m] * coordinate[m] for m in range(3)) + shift[k] + rng.uniform(-0.005, 0.005)
+                                for k in range(3)]) for element, coordinate in atoms_list]
+            rng.shuffle(moved)
+            files.append((f'dup{n:05d}_copy_0_1', moved))
+            copies[f'dup{n:05d}_copy_0_1'] = f'dup{n:05d}_0_1'
+        for name, contents in files:
+            with open(os.path.join(directory, f'{name}.xyz'), 'w') as file:
+                file.write(f'{atoms}\nsynthetic molecule {name}\n')
+                for element, coordinate in contents:
+                    file.write(f'{element}  {coordinate[0]:.6f}  {coordinate[1]:.6f}  {coordinate[2]:.6f}\n')
+    return copies
+
+def peak_memory_mb():
+    """peak resident memory (MB) of this process and of its finished children, e.g. a pool of parsers"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    #ru_maxrss is in kB on linux
+    return max(own, children) / 1024
+
+def process_stage(directory, workers, queue):
+    """runs process_out_files() on directory and reports its wall time and peak memory"""
+    sys.path.insert(0, SCRIPTS_PATH)
+    import process_orca_4_v2_25 as process_orca_4
+    os.chdir(directory)
+    process_orca_4.job_name = os.path.basename(directory)
+    start = time.perf_counter()
+    process_orca_4.process_out_files(workers, use_cache=False)
+    queue.put({'seconds': time.perf_counter() - start, 'peak memory (MB)': peak_memory_mb()})
+
+def launch_stage(directory, settings_path, queue):
+    """runs launch_orca_4 on the .xyz files of directory and reports its wall time and peak memory"""
+    sys.path.insert(0, SCRIPTS_PATH)
+    import launch_orca_4_v3_20 as launch_orca_4
+    os.chdir(directory)
+    #the globals the launch script sets in its __main__ block
+    launch_orca_4.arg_list = ['1:00:00', settings_path]
+    launch_orca_4.email = 'benchmark@example.com'
+    launch_orca_4.DEFAULT_PATH = SETTINGS_PATH
+    launch_orca_4.DEFAULT_TIME = '1:00:00'
+    launch_orca_4.MAX_ALLOWED_MEM = 120
+    launch_orca_4.TIME_SAFETY_FACTOR = 1.5
+    launch_orca_4.MIN_BIN_TIME = 0.25
+    launch_orca_4.MEMORY_CLASSES = [1000, 1500, 2000, 3000, 4000, 6000, 8000, 12000, 16000]
+    launch_orca_4.MODEL_PATH = os.path.join(directory, 'no_resource_model.json')
+    launch_orca_4.BASIS_PATH = os.path.join(SCRIPTS_PATH, 'basis_functions.json')
+    launch_orca_4.job_name = os.path.basename(directory)
+    launch_orca_4.version = launch_orca_4.edit_history.strip().split('\n')[-1].split()[0]
+    start = time.perf_counter()
+    launch_orca_4.main()
+    queue.put({'seconds': time.perf_counter() - start, 'peak memory (MB)': peak_memory_mb()})
+
+def dedup_stage(directory, queue):
+    """runs find_duplicates() of launch_orca_4 on the .xyz files of directory and reports the duplicates it found"""
+    sys.path.insert(0, SCRIPTS_PATH)
+    import launch_orca_4_v3_20 as launch_orca_4
+    os.chdir(directory)
+    start = time.perf_counter()
+    duplicates = launch_orca_4.find_duplicates(0.1)
+    queue.put({'seconds': time.perf_counter() - start, 'peak memory (MB)': peak_memory_mb(),
+               'duplicates': {duplicate: kept for duplicate, (kept, rmsd) in duplicates.items()}})
+
+def measure(target, *args):
+    """runs one stage in a fresh python process and returns its measurements
+    Returns None if the stage raises (its traceback is printed by the child process), exits without reporting,
+    or does not report within STAGE_TIMEOUT seconds, in which case it is terminated"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=target, args=args + (results,))
+    process.start()
+    start = time.perf_counter()
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=1)
+        except queue.Empty:
+            if time.perf_counter() - start > STAGE_TIMEOUT:
+                process.terminate()
+                break
+            #a stage that exits flushes what it reported first, so one last look finds a result sent just before the exit
+            if process.exitcode is not None:
+                try:
+                    result = results.get(timeout=1)
+                except queue.Empty:
+                    pass
+                break
+    process.join()
+    if result is None or process.exitcode != 0:
+        print(f'Error! {target.__name__} failed (exit code {process.exitcode}).')
+        return None
+    return result
+
+def check_golden(directory, golden):
+    """compares the summary and timings .csv files in directory to the golden set and returns a list of the mismatches"""
+    found = {}
+    for table in ('summary', 'timings'):
+        with open(os.path.join(directory, f'{os.path.basename(directory)}_{table}.csv'), newline='') as file:
+            reader = csv.reader(file)
+            next(reader)
+            header = next(reader)
+            for row in reader:
+                found.setdefault(row[0], {}).update(zip(header, row))
+
+    mismatches = []
+    for name, expected in golden.items():
+        if name not in found:
+            mismatches.append(f'{name}: missing from the summary')
+            continue
+        for column, value in expected.items():
+            if found[name].get(column) != value:
+                mismatches.append(f'{name}: {column} is {found[name].get(column)!r}, expected {value!r}')
+    for name in found:
+        if name not in golden:
+            mismatches.append(f'{name}: not expected in the summary')
+    return mismatches
+
+def script_versions():
+    """the latest version in the edit history of each benchmarked script"""
+    versions = {}
+    for script in ('process_orca_4_v2_25.py', 'launch_orca_4_v3_20.py'):
+        with open(os.path.join(SCRIPTS_PATH, script), 'r') as file:
+            text = file.read()
+        history = text.split('edit_history = """')[1].split('"""')[0]
+        versions[script] = history.strip().split('\n')[-1].split()[0]
+    return versions
+
+def compare_to_history(result, results_path):
+    """reports slowdowns and memory growth beyond REGRESSION_TOLERANCE against the last run with the same parameters"""
+    previous = None
+    try:
+        with open(results_path, 'r') as file:
+            for line in file:
+                entry = json.loads(line)
+                if entry.get('parameters') == result['parameters']:
+                    previous = entry
+    except (OSError, ValueError):
+        pass
+    if previous is None:
+        print('No previous run with these parameters to compare to.')
+        return
+
+    print(f'Compared to the run of {previous["date"]} ({previous["versions"]}):')
+    for stage in ('process', 'launch'):
+        for metric, worse in (('files per second', lambda new, old: new < old * (1 - REGRESSION_TOLERANCE)),
+                              ('peak memory (MB)', lambda new, old: new > old * (1 + REGRESSION_TOLERANCE))):
+            new, old = result[stage][metric], previous[stage][metric]
+            flag = '  <-- REGRESSION' if worse(new, old) else ''
+            print(f'    {stage:8} {metric:17} {old:10.1f} -> {new:10.1f}{flag}')
+
+def run_benchmark(n_files, atoms, cycles, size, workers, seed, directory, keep, results_path):
+    """generates the synthetic files, measures both stages, checks the golden set and saves the results"""
+    temporary = directory is None
+    if temporary:
+        directory = tempfile.mkdtemp(prefix='benchmark_orca_4_')
+    directory = os.path.abspath(directory)
+    out_directory = os.path.join(directory, 'outputs')
+    xyz_directory = os.path.join(directory, 'inputs')
+
+    print(f'Writing {n_files} synthetic .out files to {out_directory}')
+    start = time.perf_counter()
+    golden = write_out_files(out_directory, n_files, atoms, cycles, size, seed)
+    out_files = [entry for entry in os.scandir(out_directory)]
+    megabytes = sum(entry.stat().st_size for entry in out_files) / 1e6
+    print(f'    {megabytes:.1f} MB written in {time.perf_counter() - start:.1f} s')
+    write_xyz_files(xyz_directory, n_files, atoms, seed)
+
+    process = measure(process_stage, out_directory, workers)
+    if process is None:
+        return False
+    process['files per second'] = len(out_files) / process['seconds']
+    process['MB per second'] = megabytes / process['seconds']
+    mismatches = check_golden(out_directory, golden)
+    process['golden mismatches'] = len(mismatches)
+
+    launch = measure(launch_stage, xyz_directory, os.path.join(SETTINGS_PATH, 'opt_default'))
+    if launch is None:
+        return False
+    launch['files per second'] = n_files / launch['seconds']
+    n_inputs = sum(entry.name.endswith('.inp') for entry in os.scandir(xyz_directory))
+    if n_inputs != n_files:
+        mismatches.append(f'launch_orca_4 wrote {n_inputs} .inp files for {n_files} .xyz files')
+
+    copies = write_duplicate_files(os.path.join(directory, 'duplicates'), max(2, n_files // 10), atoms, seed)
+    dedup = measure(dedup_stage, os.path.join(directory, 'duplicates'))
+    if dedup is None:
+        return False
+    for duplicate in sorted(set(copies) | set(dedup['duplicates'])):
+        if dedup['duplicates'].get(duplicate) != copies.get(duplicate):
+            mismatches.append(f'dedup found {duplicate} to duplicate {dedup["duplicates"].get(duplicate)}, expected {copies.get(duplicate)}')
+
+    result = {
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'versions': script_versions(),
+        'parameters': {'files': n_files, 'atoms': atoms, 'cycles': cycles, 'size (MB)': size, 'workers': workers, 'seed': seed},
+        'megabytes': round(megabytes, 3),
+        'process': process,
+        'launch': launch,
+        'golden set passed': not mismatches}
+
+    print(f'process_out_files: {process["seconds"]:.2f} s, {process["files per second"]:.1f} files/s, '
+          f'{process["MB per second"]:.1f} MB/s, peak memory {process["peak memory (MB)"]:.0f} MB')
+    print(f'launch_orca_4:     {launch["seconds"]:.2f} s, {launch["files per second"]:.1f} files/s, '
+          f'peak memory {launch["peak memory (MB)"]:.0f} MB')
+    if mismatches:
+        print(f'Golden set FAILED with {len(mismatches)} mismatches, e.g.:')
+        for mismatch in mismatches[:10]:
+            print(f'    {mismatch}')
+    else:
+        print(f'Golden set passed ({len(golden)} rows).')
+
+    compare_to_history(result, results_path)
+    with open(results_path, 'a') as file:
+        file.write(json.dumps(result) + '\n')
+    print(f'Results appended to {results_path}')
+
+    if temporary and not keep:
+        shutil.rmtree(directory)
+    return not mismatches
+
+def parse_arguments():
+    """reads the optional command line arguments"""
+    parser = argparse.ArgumentParser(description='Benchmarks process_orca_4 and launch_orca_4 on synthetic orca 4.2.1 files.')
+    parser.add_argument('-n', '--files', type=int, default=200, help='number of synthetic .out and .xyz files')
+    parser.add_argument('--atoms', type=int, default=30, help='atoms per molecule')
+    parser.add_argument('--cycles', type=int, default=10, help='optimization cycles per job')
+    parser.add_argument('--size', type=float, default=0, metavar='MB', help='pads each .out file to roughly MB megabytes')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='workers passed to process_out_files')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generator')
+    parser.add_argument('--directory', metavar='DIR', help='where the synthetic files are written')
+    parser.add_argument('--keep', action='store_true', help='keeps the synthetic files')
+    parser.add_argument('--results', metavar='PATH', default=RESULTS_FILE, help='history file the results are appended to')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    passed = run_benchmark(args.files, args.atoms, args.cycles, args.size, args.workers, args.seed,
+                           args.directory, args.keep, args.results)
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,1425 @@
+""" 
+This script iteratively creates .inp files for multiple .xyz files which all use the same orca keywords
+each .xyz file should be named with the format {molecule_name}_{charge}_{spin}.xyz
+for positive charges, use either the number or p (e.g. 1, 2, p1, p2)
+for negative charges, use m (e.g. m1, m2)
+the orca keywords will either be taken from a set of default files found at carrow_bin/python_scripts/orca_settings/ or a local file specified as an argument.
+While creating the .inp files, this script renames the .xyz files to {molecule_name}_{charge}_{spin}_in.xyz
+Lastly, this script creates a batch SLURM job using the memory and parallelization data  in the specified file.
+If no memory is specified, each input gets its own estimated %maxcore, and the inputs are split into memory classes
+with one SLURM job ({job_name}_mem{MB}.sh) per class. The names of every .sh file written are listed in {job_name}_scripts.txt
+
+This script takes up to three optional user-specified system arguments - the job time, the memory per core, and a settings file
+Several settings files can be separated by commas (e.g. opt_default,SP_default) to chain the jobs in one input with $new_job
+If a resource model has been fitted to previous outputs with process_orca_4 --fit-model (saved to python_scripts/resource_model.json)
+and it covers the chosen settings files, it predicts the memory per core and the job time instead of the rough estimates
+Otherwise, if the basis set of the settings files is in python_scripts/basis_functions.json, the memory per core and job time
+are estimated from the number of basis functions, the method and the job type
+The keyword argument array (or array%N) submits one SLURM array task per .xyz file instead of running them one after another,
+with at most N tasks running at once
+The keyword argument bins=hh:mm:ss estimates the time of each subjob from its atoms and packs the subjobs
+into several SLURM scripts ({job_name}_bin1.sh, ...), each fitting the target time and requesting only the time it needs
+The keyword argument slots=K runs up to K subjobs at once in each allocation, each with %pal nprocs set to its share of the cores
+(an allocation with fewer than K subjobs splits the cores between them), and starts the next subjob as soon as one finishes.
+The job time of each allocation is estimated from the time of each subjob on its share of the cores
+The keyword argument compress (or compress=N) gzips results larger than N MB (default 100) as they are copied back from scratch.
+restart, process_orca_4 (outputs, negative frequencies and the result cache) read the .gz files as they are
+The keyword argument restart finds the .out files which did not terminate normally or did not converge, and restarts them
+from their last geometry, reading the previous orbitals (and Hessian, if the settings do not calculate one) with MORead.
+Optimizations that did not converge or stopped with an error use the repair_opt or repair_TS settings unless a settings file is given,
+and jobs that ran out of time continue with their own settings. The .sh files are named {job_name}_restart
+Subjobs of this directory which squeue lists as queued or running are not restarted. If squeue cannot be run, .out files written
+in the last RUNNING_MINUTES minutes without a final ORCA banner are taken to be running instead
+The keyword argument dedup (or dedup=R) compares the geometries with the same elements (in any order), charge and spin, and moves every .xyz file
+within an RMSD of R angstroms (default 0.1, after optimal alignment) of an earlier one to duplicates/, listing them in {job_name}_duplicates.csv.
+This requires numpy
+The keyword argument cache (or cache=link) looks up each subjob in the lab's result cache (carrow_bin/result_cache/), which is keyed by a hash
+of the settings (without comments or resource lines), charge, spin and geometry and filled by process_orca_4 --result-cache.
+The .out, .gbw and .hess files of every hit are copied (or hard linked) into the working directory instead of running the job again
+This script requires no particular order for its arguments
+The shell script which launches this script passes the user email (sys.argv[4]) as well as the path to the carrow group bin (sys.argv[5]).
+This script reads the working directory's name and uses it as a variable, along with the names of the .xyz files
+"""
+
+#####################
+###Version Control###
+#####################
+
+#(since I will probably not convince the Carrow lab to use Github)
+#Update this comment whenever edits are made.
+
+edit_history = """
+version Initials    Date            Summary
+1.0     ARS         23-Jun-2023     First draft of entire codebase is written
+2.0     ARS         25-Jun-2023     Restructured to create individual .inp files and launch them all from a common .sh file
+2.1     ARS         25-Jun-2023     Streamlined code and incorporated ChatGPT reccomendations
+2.2     ARS         25-Jun-2023     Further edits under the wise guidance of ChatGPT
+2.3     ARS         26-Jun-2023     Moved constants to __main__ block per unquestionable tutelage of ChatGPT
+2.4     ARS         27-Jun-2023     Debugged a few problems
+3.0     ARS         20-Jul-2023     Added two optional arguemts for memory and settings file. Made time optional. Added a function for estimating memory cost. Changed way settings path is hard coded
+3.1     ARS         17-Oct-2026     Comma-separated settings files are chained into one input with $new_job. Fixed the third argument being dropped
+3.2     ARS         17-Oct-2026     Added SLURM job array mode (array or array%N) with a manifest of subjobs
+3.3     ARS         17-Oct-2026     Added bins=hh:mm:ss, which packs subjobs into several allocations using a time estimate for each subjob
+3.4     ARS         17-Oct-2026     Each input gets its own estimated %maxcore. Subjobs are grouped into memory classes, each with its own --mem
+3.5     ARS         17-Oct-2026     Loads the resource model fitted by process_orca_4 --fit-model to predict memory and job time
+3.6     ARS         17-Oct-2026     Estimates memory and job time from the number of basis functions (python_scripts/basis_functions.json) when there is no fitted model. Atoms of unrecognized elements are reported
+3.7     ARS         17-Oct-2026     Each subjob stages only its own files to scratch (listed in {script_name}_staging.txt) and copies its results back as soon as it finishes. Added compress[=N]
+3.8     ARS         17-Oct-2026     Added slots=K, which runs K subjobs at once in each allocation, each with its share of the cores in %pal nprocs
+3.9     ARS         17-Oct-2026     Added restart, which resubmits failed or unconverged jobs from their last geometry with MORead of their orbitals
+3.10    ARS         17-Oct-2026     Added dedup[=R], which moves .xyz files within an RMSD of R angstroms of another geometry to duplicates/ before any input is written
+3.11    ARS         17-Oct-2026     Added cache[=link], which copies the results of identical jobs from the result cache filled by process_orca_4 instead of running them
+3.12    ARS         17-Oct-2026     slots: each allocation splits its cores between min(K, its subjobs) subjobs, its time is estimated on those cores, and the concurrent mpiruns are not bound to the same cores
+3.13    ARS         17-Oct-2026     restart skips the subjobs still queued or running (from squeue, or else recently written .out files)
+3.14    ARS         17-Oct-2026     restart also finds compressed (.gz/.xz) geometries, orbitals and Hessians, decompressing them to the staged _restart files
+3.15    ARS         17-Oct-2026     the duplicates/ directory and {job_name}_duplicates.csv written by dedup are not reported as stray files
+3.16    ARS         17-Oct-2026     restart handles compressed .out files (.out.gz or .out.xz)
+3.17    ARS         17-Oct-2026     job_hash and the resource model features are imported from orca_jobs_v1_0.py, which process_orca_4 shares, so the two scripts no longer import each other for them
+3.18    ARS         17-Oct-2026     dedup compares geometries with the same composition whatever the order of their atoms, pairing the atoms of each element by distance when needed
+3.19    ARS         17-Oct-2026     copy_back only copies the subjob's own files ({subjob_name}.*, _trj.xyz and _property.txt), so subjobs sharing scratch with slots never copy each other's files. compress removes the uncompressed copy of each file it gzips
+3.20    ARS         17-Oct-2026     restart only uses repair_opt/repair_TS for optimizations that did not converge or stopped with an error; jobs that ran out of time continue with their own settings. .out files which are not named {name}_{charge}_{spin} are skipped with a warning
+"""
+#note that the most recent version number is extracted when script is launched as version
+
+import os
+import sys
+import gzip
+import json
+import lzma
+import math
+import zlib
+import shutil
+import subprocess
+import time
+from collections import deque
+from orca_jobs_v1_0 import count_rows, memory_features, time_features, hash_settings_lines, job_hash, result_cache_entry
+
+def assign_arguments (arg_list):
+    """determines which system argument is job_time, which is memory_per_core, and which are settings_paths
+    several settings files separated by commas (e.g. opt_default,SP_default) are chained into one input with $new_job
+    keyword arguments (e.g. array%10) are returned in the options dictionary"""
+    #TODO: error handling for format of memory_per_core and job_time
+    
+    job_time = None
+    memory_per_core = None
+    settings_paths = None
+    options = {}
+    
+    for arg in arg_list:
+        #array or array%N submits a SLURM job array, running at most N subjobs at once (0 means no limit)
+        if arg == 'array' or arg.startswith('array%'):
+            options['array'] = int(arg[6:]) if '%' in arg else 0
+        #bins=hh:mm:ss packs the subjobs into several allocations which each fit the target time
+        elif arg.startswith('bins='):
+            options['bins'] = arg[5:]
+        #compress or compress=N gzips results larger than N MB (default 100) as they are copied back from scratch
+        elif arg == 'compress' or arg.startswith('compress='):
+            options['compress'] = int(arg[9:]) if '=' in arg else 100
+        #restart resubmits the failed or unconverged jobs of the working directory
+        elif arg == 'restart':
+            options['restart'] = True
+        #slots=K runs K subjobs at once in each allocation, each on its share of the cores
+        elif arg.startswith('slots='):
+            options['slots'] = int(arg[6:])
+        #cache or cache=link reuses the results of identical jobs from the lab's result cache instead of running them
+        elif arg == 'cache' or arg == 'cache=link':
+            options['cache'] = 'link' if arg == 'cache=link' else 'copy'
+        #dedup or dedup=R skips geometries within an RMSD of R angstroms (default 0.1) of another .xyz file
+        elif arg == 'dedup' or arg.startswith('dedup='):
+            options['dedup'] = float(arg[6:]) if '=' in arg else 0.1
+        elif ':' in arg:
+            job_time = arg
+        elif arg.endswith('M'):
+            memory_per_core = int(arg[:-1])
+        elif all(os.path.exists(path) for path in arg.split(',')):
+            settings_paths = arg.split(',')
+        else:
+            print(f'Error: {arg} not recognized')
+            print('Usage: launch_orca_4 d:hh:mm:ss nM settings_file[,settings_file...] [array[%N] | bins=hh:mm:ss] [slots=K] [compress[=N]] [restart] [dedup[=R]] [cache[=link]]')
+            exit(1)
+            
+    return job_time, memory_per_core, settings_paths, options
+            
+def indent(n, string):
+    """Indents single digit entries for cleanliness."""
+    if n < 10:
+        return(f' {string}')
+    else:
+        return(string)
+
+def geometry_elements(inlines):
+    """takes the lines of an xyz file and returns a dictionary of {element: count}
+    element symbols are capitalized (e.g. CL -> Cl)"""
+
+    elements = {}
+    
+    for line in inlines[2:]:
+        if len(line.split()) == 4:
+            atom = line.split()[0].capitalize()
+            elements[atom] = elements.get(atom, 0) + 1
+                
+    return elements
+
+def element_count(file):
+    """reads an xyz file and returns a dictionary of {element: count}"""
+    with open(file, 'r') as f:
+        return geometry_elements(f.readlines())
+
+def atom_count(file):
+    """reads an xyz file and returns the number of atoms from each row of the periodic table.
+    Atoms in rows 6 and 7 are both partitioned into n6"""
+    return count_rows(element_count(file))
+
+def estimate_memory(atom_count):
+    """takes a 6 element list which indicates the atom count from an xyz file
+    then estimates the memory demands from this data in MB
+    as of now, all jobs are assumed to use the opt orca_settings file"""
+    
+    MIN = 2
+    def mem_model(data_subset):
+        """model of the memory demand as a function of number of each atom type"""
+        n1, n2, n3, n4, n5, n6 = data_subset
+        return((0)*n1 + 100*n2 + 100*n3 + 100*n4 + 100*n5 + 100*n6 + 1000)
+    
+    memory_estimate = mem_model(atom_count)
+    if memory_estimate < MIN:
+        memory_estimate = MIN
+
+    return memory_estimate
+
+def estimate_time(atom_count):
+    """takes a 6 element list which indicates the atom count from an xyz file
+    then estimates the wall time of one subjob in hours
+    assumes cubic scaling in a weighted atom count, roughly calibrated on opt freq jobs with the default settings"""
+
+    MIN = 0.05
+    def time_model(data_subset):
+        """model of the wall time as a function of number of each atom type"""
+        n1, n2, n3, n4, n5, n6 = data_subset
+        size = 0.2*n1 + 1.0*n2 + 1.5*n3 + 2.0*n4 + 2.5*n5 + 3.0*n6
+        return((size / 30)**3)
+
+    time_estimate = time_model(atom_count)
+    if time_estimate < MIN:
+        time_estimate = MIN
+
+    return time_estimate
+
+def load_basis_table(basis_path):
+    """loads the number of basis functions of each element for each basis set, {basis: {element: count}}
+    basis set names are lowercase. Returns an empty table if the file cannot be read"""
+    try:
+        with open(basis_path, 'r') as file:
+            return json.load(file)['basis sets']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def count_basis_functions(elements, basis, basis_table):
+    """takes a dictionary of {element: count} and returns the number of basis functions in the chosen basis set
+    returns None if the basis set or any of the elements is missing from the table"""
+    if basis not in basis_table:
+        return None
+    n_basis = 0
+    for atom, count in elements.items():
+        if atom not in basis_table[basis]:
+            return None
+        n_basis += count * basis_table[basis][atom]
+    return n_basis
+
+def analytic_estimate(settings_lines, elements, basis_table):
+    """estimates the memory per core (MB) and the cost (core-hours) of one job from the number of basis functions
+    the method, basis set and job type are read from the ! line(s) of the settings file.
+    The cost of a single point scales as a power of the number of basis functions which depends on the method,
+    and optimizations and frequencies count as a number of single points.
+    returns None if the basis set is not in the table, so that the rough estimates can be used instead"""
+
+    #method: (scaling exponent, core-hours of a single point with 100 basis functions)
+    methods = {
+        'hf': (3, 0.003), 'b3lyp': (3, 0.003), 'pbe0': (3, 0.003), 'tpssh': (3, 0.003), 'm06': (3, 0.003),
+        'm062x': (3, 0.003), 'wb97x': (3, 0.003), 'wb97x-d3': (3, 0.003), 'cam-b3lyp': (3, 0.003),
+        'pbe': (3, 0.0015), 'bp86': (3, 0.0015), 'blyp': (3, 0.0015), 'tpss': (3, 0.0015), 'r2scan': (3, 0.0015),
+        'ri-mp2': (4, 0.004), 'mp2': (5, 0.01), 'dlpno-ccsd(t)': (3, 0.06), 'ccsd(t)': (7, 0.05)}
+    GGA = ('pbe', 'bp86', 'blyp', 'tpss', 'r2scan')
+    CORRELATED = ('ri-mp2', 'mp2', 'dlpno-ccsd(t)', 'ccsd(t)')
+
+    keywords = ' '.join(line[1:].lower() for line in settings_lines if line.startswith('!')).split()
+    basis = next((keyword for keyword in keywords if keyword in basis_table), None)
+    if basis == None:
+        return None
+    n_basis = count_basis_functions(elements, basis, basis_table)
+    if n_basis == None:
+        return None
+    n_atoms = sum(elements.values())
+
+    #methods not in the list are treated as hybrid DFT, which most settings files use
+    method = next((keyword for keyword in keywords if keyword in methods), 'b3lyp')
+    exponent, prefactor = methods[method]
+    single_point = prefactor * (n_basis / 100)**exponent
+    #hybrids without RIJCOSX compute the exchange exactly, GGAs use RI-J by default either way
+    if method not in GGA and method not in CORRELATED and 'rijcosx' not in keywords:
+        single_point *= 3
+    if any(keyword.startswith('cpcm') or keyword.startswith('smd') for keyword in keywords):
+        single_point *= 1.1
+
+    #job type as a number of single points
+    cost = 1
+    if 'optts' in keywords:
+        cost = 30
+    elif 'opt' in keywords or 'tightopt' in keywords:
+        cost = 20
+    if 'freq' in keywords:
+        cost += 0.4 * n_atoms
+    elif 'numfreq' in keywords:
+        cost += 6 * n_atoms
+
+    #a few dozen matrices of n_basis x n_basis on each core on top of the fixed demand
+    memory = 1000 + 10 * (n_basis / 100)**2
+    if 'freq' in keywords or 'numfreq' in keywords:
+        memory *= 1.25
+    if method in CORRELATED:
+        memory *= 2
+
+    return math.ceil(memory), single_point * cost
+
+def settings_commands(settings_lines):
+    """returns the ! line of a settings file as it appears in the command line column of process_orca_4"""
+    for line in settings_lines:
+        if line.startswith('!'):
+            return line.strip().lower()
+
+def load_resource_model(model_path, settings_chain):
+    """loads the models fitted by process_orca_4 --fit-model for each settings file in the chain
+    returns None if there is no model file or any of the settings files has not been fitted"""
+    try:
+        with open(model_path, 'r') as file:
+            fitted = json.load(file)['settings']
+    except (OSError, ValueError, KeyError):
+        return None
+
+    models = [fitted.get(settings_commands(settings_lines)) for settings_lines in settings_chain]
+    if None in models:
+        return None
+    return models
+
+def predict_resources(models, atom_count, ncores):
+    """predicts the memory per core (MB) and wall time (hours) of one subjob from the fitted models of its settings files
+    the memory is the largest of the chained jobs and the time is their sum"""
+    MIN = 500
+    memory = 0
+    hours = 0
+    for model in models:
+        memory = max(memory, sum(c * x for c, x in zip(model['memory'], memory_features(atom_count))))
+        hours += math.exp(sum(c * x for c, x in zip(model['time'], time_features(atom_count)))) / ncores
+
+    return max(MIN, math.ceil(memory)), hours
+
+def predict_analytic(settings_chain, elements, basis_table, ncores):
+    """predicts the memory per core (MB) and wall time (hours) of one subjob from the basis functions of each chained job
+    the memory is the largest of the chained jobs and the time is their sum. Returns None if any job cannot be estimated"""
+    MIN = 500
+    memory = 0
+    hours = 0
+    for settings_lines in settings_chain:
+        estimate = analytic_estimate(settings_lines, elements, basis_table)
+        if estimate == None:
+            return None
+        memory = max(memory, estimate[0])
+        hours += estimate[1] / ncores
+
+    return max(MIN, memory), hours
+
+def time_to_hours(job_time):
+    """converts a SLURM time (d-hh:mm:ss, dd:hh:mm:ss, hh:mm:ss or mm:ss) to hours"""
+    days = 0
+    if '-' in job_time:
+        days, job_time = job_time.split('-')
+    fields = [float(field) for field in job_time.split(':')]
+    if len(fields) == 4:
+        days, fields = fields[0], fields[1:]
+    while len(fields) < 3:
+        fields.insert(0, 0)
+    hours, minutes, seconds = fields
+    return 24*float(days) + hours + minutes/60 + seconds/3600
+
+def hours_to_time(hours):
+    """converts hours to a SLURM time (d-hh:mm:ss), rounded up to the next minute"""
+    minutes = math.ceil(hours * 60)
+    days, minutes = divmod(minutes, 24*60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{days}-{hours:02d}:{minutes:02d}:00'
+
+def pack_subjobs(estimates, target):
+    """packs subjobs into bins whose summed time estimates fit the target time (in hours)
+    estimates is a dictionary of {subjob_name: hours}. Returns a list of bins, each a list of subjob names.
+    The number of bins comes from first-fit decreasing, which keeps the total core-hours requested low.
+    The subjobs are then spread over that many bins longest-first to even out the bins and shorten the makespan.
+    Subjobs longer than the target get a bin of their own."""
+    ordered = sorted(estimates, key=lambda subjob_name: (-estimates[subjob_name], subjob_name))
+
+    #first-fit decreasing
+    first_fit = []
+    for subjob_name in ordered:
+        for bin_ in first_fit:
+            if bin_['load'] + estimates[subjob_name] <= target:
+                bin_['load'] += estimates[subjob_name]
+                bin_['subjobs'].append(subjob_name)
+                break
+        else:
+            first_fit.append({'load': estimates[subjob_name], 'subjobs': [subjob_name]})
+
+    #longest processing time first over the same number of bins
+    balanced = [{'load': 0, 'subjobs': []} for bin_ in first_fit]
+    for subjob_name in ordered:
+        bin_ = min(balanced, key=lambda bin_: bin_['load'])
+        bin_['load'] += estimates[subjob_name]
+        bin_['subjobs'].append(subjob_name)
+
+    #the balanced packing is only used if it does not push a shared bin over the target
+    if any(bin_['load'] > target and len(bin_['subjobs']) > 1 for bin_ in balanced):
+        return [bin_['subjobs'] for bin_ in first_fit]
+    return [bin_['subjobs'] for bin_ in balanced]
+
+def slot_plan(subjob_names, estimates, ncores, slots):
+    """the cores of each subjob and the wall time (hours) of subjobs which share one allocation of ncores cores,
+    running at most slots of them at once. Fewer subjobs than slots each get a larger share of the cores.
+    estimates is a dictionary of {cores: {subjob_name: hours on that many cores}}, covering ncores // K for K up to slots.
+    The subjobs start in the order given, each in the first slot to free up, and the wall time is when the last one finishes.
+    Returns (cores, hours)"""
+    running = min(slots, len(subjob_names))
+    cores = ncores // running
+    finish = [0.0] * running
+    for subjob_name in subjob_names:
+        slot = finish.index(min(finish))
+        finish[slot] += estimates[cores][subjob_name]
+    return cores, max(finish)
+
+def pack_slot_subjobs(estimates, target, ncores, slots):
+    """packs subjobs into bins which each run slots subjobs at once (see slot_plan) and finish within the target time (in hours)
+    first-fit decreasing on the wall time of each bin, so the bins start their longest subjobs first.
+    estimates is as in slot_plan, restricted to the subjobs to pack.
+    Subjobs which do not fit the target even with all the cores get a bin of their own.
+    Returns a list of bins, each a list of subjob names."""
+    ordered = sorted(estimates[ncores], key=lambda subjob_name: (-estimates[ncores][subjob_name], subjob_name))
+    bins = []
+    for subjob_name in ordered:
+        for bin_ in bins:
+            if slot_plan(bin_ + [subjob_name], estimates, ncores, slots)[1] <= target:
+                bin_.append(subjob_name)
+                break
+        else:
+            bins.append([subjob_name])
+    return bins
+
+def get_subjob_properties(filename):
+    """Extracts subjob name, charge, and spin from the filename."""
+    #TODO: graceful error handling of improperly named jobs
+    #TODO: handles jobs that already have the _in ending
+    subjob_name = filename.split('.')[0]
+    
+    parts = filename[:-4].split('_')
+    
+    if parts[-2].startswith('m'):
+        charge = -int(parts[-2][1:])
+    elif parts[-2].startswith('p'):
+        charge = int(parts[-2][1:])
+    else:
+        charge = int(parts[-2])
+
+    spin = int(parts[-1])
+    
+    return subjob_name, charge, spin
+
+def load_settings(settings_path):
+    """reads a settings file and makes sure its last line ends with a newline"""
+    with open(settings_path, 'r') as file:
+        settings_lines = file.readlines()
+    if settings_lines[-1][-1] != '\n':
+        settings_lines[-1] += '\n'
+    return settings_lines
+
+def settings_ncores(settings_lines):
+    """returns the number of cores requested by %pal nprocs in a settings file, or None if there is none"""
+    ncores = None
+    for line in settings_lines:
+        if line.lower().startswith('%pal nprocs'):
+            ncores = int(line.split()[-2])
+    return ncores
+
+def write_orca_input(subjob_name, charge, spin, geometry, settings_chain, maxcore, nprocs=None, moread=None, hess=None):
+    """Writes {subjob_name}.inp with one job per settings file, chained with $new_job.
+    Every job after an optimization starts from the optimized geometry.
+    nprocs replaces the %pal nprocs of the settings files if given.
+    moread (a .gbw file) and hess (a .hess file) are read by the first job, which is used to restart a job"""
+    with open(f'{subjob_name}.inp', 'w') as inp_file:
+        for n, settings_lines in enumerate(settings_chain):
+            if n > 0:
+                inp_file.write('$new_job\n')
+            if nprocs == None:
+                inp_file.writelines(settings_lines)
+            else:
+                for line in settings_lines:
+                    if line.lower().startswith('%pal nprocs'):
+                        line = f'%pal nprocs {nprocs} end\n'
+                    inp_file.write(line)
+            if n == 0 and moread != None:
+                inp_file.write(f'! MORead\n%moinp "{moread}"\n')
+            if n == 0 and hess != None:
+                inp_file.write(f'%geom InHess Read InHessName "{hess}" end\n')
+            inp_file.write(f'%maxcore {maxcore}\n')
+            inp_file.write(f'* xyzfile {charge} {spin} {geometry}\n\n')
+
+            #orca writes the optimized geometry to {subjob_name}.xyz
+            commands = ''.join(line.lower() for line in settings_lines if line.startswith('!'))
+            if 'opt' in commands:
+                geometry = f'{subjob_name}.xyz'
+        inp_file.write(f'# This input file was created with {os.path.basename(__file__)} version {version}\n')
+
+def geometry_coordinates(inlines):
+    """takes the lines of an xyz file and returns (elements, coordinates), a list of element symbols and a list of [x, y, z]"""
+    elements = []
+    coordinates = []
+    for line in inlines[2:]:
+        if len(line.split()) == 4:
+            elements.append(line.split()[0].capitalize())
+            coordinates.append([float(x) for x in line.split()[1:]])
+    return elements, coordinates
+
+def kabsch_rmsd(first, second):
+    """returns the RMSD after optimal superposition (Kabsch) of each pair of geometries in two arrays of shape (pairs, atoms, 3)
+    the atoms are paired by their order. The RMSD is found from the singular values of the covariance matrices, so the rotations are never built"""
+    import numpy as np
+
+    first = first - first.mean(axis=1, keepdims=True)
+    second = second - second.mean(axis=1, keepdims=True)
+    covariance = np.matmul(first.transpose(0, 2, 1), second)
+    singular_values = np.linalg.svd(covariance, compute_uv=False)
+    #a reflection is not allowed, so the smallest singular value changes sign if the best fit would need one
+    singular_values[:, 2] *= np.where(np.linalg.det(covariance) < 0, -1, 1)
+    squared = (first**2).sum(axis=(1, 2)) + (second**2).sum(axis=(1, 2)) - 2 * singular_values.sum(axis=1)
+    return np.sqrt(np.maximum(squared, 0) / first.shape[1])
+
+def sort_atoms(elements, coordinates):
+    """returns (elements, coordinates) with the atoms sorted by element and then by their distance from the centroid,
+    which gives every copy of a geometry the same atom order unless two atoms of an element are about as far from the centroid"""
+    import numpy as np
+
+    coordinates = np.array(coordinates)
+    distances = np.linalg.norm(coordinates - coordinates.mean(axis=0), axis=1)
+    order = sorted(range(len(elements)), key=lambda atom: (elements[atom], distances[atom]))
+    return [elements[atom] for atom in order], coordinates[order]
+
+def match_atoms(first, second, blocks):
+    """pairs each atom of first with the closest unpaired atom of the same element in second (both of shape (atoms, 3), already aligned)
+    blocks are the slices of the atoms of each element. Returns the order of the atoms of second that follows first"""
+    import numpy as np
+
+    order = np.arange(len(first))
+    for block in blocks:
+        distances = np.linalg.norm(first[block, None, :] - second[None, block, :], axis=2)
+        size = len(distances)
+        assigned = np.full(size, -1)
+        used = np.zeros(size, dtype=bool)
+        for pair in np.argsort(distances, axis=None):
+            i, j = divmod(int(pair), size)
+            if assigned[i] < 0 and not used[j]:
+                assigned[i] = j
+                used[j] = True
+        order[block] = block.start + assigned
+    return order
+
+def matched_rmsd(first, second, blocks):
+    """returns the RMSD of two geometries of shape (atoms, 3) with their atoms sorted by element (blocks are the slices of each element)
+    after optimal superposition, pairing the atoms of each element by distance rather than by their order.
+    Starting from the given order and from each alignment of the principal axes of the two geometries, the atoms are paired
+    with their closest counterparts and the geometries superposed again (Kabsch), a few times over, and the lowest RMSD is kept"""
+    import numpy as np
+
+    first = first - first.mean(axis=0)
+    second = second - second.mean(axis=0)
+    first_axes = np.linalg.eigh(first.T @ first)[1]
+    second_axes = np.linalg.eigh(second.T @ second)[1]
+    starts = [None]
+    for signs in ((1, 1, 1), (1, 1, -1), (1, -1, 1), (-1, 1, 1), (1, -1, -1), (-1, 1, -1), (-1, -1, 1), (-1, -1, -1)):
+        rotation = second_axes @ np.diag(signs) @ first_axes.T
+        #a reflection is not allowed
+        if np.linalg.det(rotation) > 0:
+            starts.append(rotation)
+
+    best = None
+    for rotation in starts:
+        order = np.arange(len(first))
+        for iteration in range(3):
+            if rotation is not None:
+                order = match_atoms(first, second @ rotation, blocks)
+            matched = second[order]
+            u, s, vt = np.linalg.svd(matched.T @ first)
+            rotation = u @ np.diag([1, 1, np.sign(np.linalg.det(u @ vt))]) @ vt
+            rmsd = np.sqrt(((matched @ rotation - first)**2).sum() / len(first))
+            if best is None or rmsd < best:
+                best = rmsd
+    return float(best)
+
+def find_duplicates(threshold):
+    """compares the geometries of every .xyz file in the working directory and returns {duplicate: (kept subjob, rmsd)}
+    only geometries with the same charge, spin and composition are compared. The atoms may be listed in any order:
+    the atoms of each geometry are sorted by element and distance from the centroid, and if the RMSD in that order is not below threshold,
+    the atoms of each element are paired by distance instead (see matched_rmsd).
+    The files are taken in order of name, and each is a duplicate if its RMSD to an earlier file that was kept is below threshold (angstroms).
+    The RMSD after alignment is at least the RMS difference of the sorted distances of the atoms of each element from the centroid,
+    which do not depend on orientation or atom order, so only the pairs that pass this prefilter are aligned"""
+    import numpy as np
+
+    groups = {}
+    for file in sorted(os.scandir('.'), key=lambda file: file.name):
+        if file.name.endswith('.xyz'):
+            subjob_name, charge, spin = get_subjob_properties(file.name)
+            with open(file, 'r') as f:
+                elements, coordinates = geometry_coordinates(f.readlines())
+            if len(elements) < 2:
+                continue
+            elements, coordinates = sort_atoms(elements, coordinates)
+            groups.setdefault((tuple(elements), charge, spin), []).append((subjob_name, coordinates))
+
+    duplicates = {}
+    for (elements, charge, spin), members in groups.items():
+        if len(members) < 2:
+            continue
+        names = [subjob_name for subjob_name, coordinates in members]
+        geometries = np.array([coordinates for subjob_name, coordinates in members])
+        blocks = []
+        for element in dict.fromkeys(elements):
+            start = elements.index(element)
+            blocks.append(slice(start, start + elements.count(element)))
+
+        #the distances from the centroid are already sorted within each element
+        distances = np.linalg.norm(geometries - geometries.mean(axis=1, keepdims=True), axis=2)
+        squared_norms = (distances**2).sum(axis=1)
+        pairs = []
+        for start in range(0, len(names), 500):
+            block = distances[start:start + 500]
+            squared = squared_norms[start:start + 500, None] + squared_norms[None, :] - 2 * block @ distances.T
+            rms = np.sqrt(np.maximum(squared, 0) / distances.shape[1])
+            first, second = np.nonzero(rms < threshold)
+            first += start
+            pairs += [(i, j) for i, j in zip(first.tolist(), second.tolist()) if i < j]
+
+        rmsd = {}
+        for start in range(0, len(pairs), 10000):
+            chunk = pairs[start:start + 10000]
+            values = kabsch_rmsd(geometries[[i for i, j in chunk]], geometries[[j for i, j in chunk]])
+            rmsd.update(zip(chunk, values.tolist()))
+        #atoms which are about as far from the centroid may be sorted differently in two copies, so those pairs are matched by distance
+        for (i, j), value in rmsd.items():
+            if value >= threshold:
+                rmsd[(i, j)] = min(value, matched_rmsd(geometries[i], geometries[j], blocks))
+
+        #each file is compared to the files kept before it
+        close = {}
+        for (i, j), value in rmsd.items():
+            if value < threshold:
+                close.setdefault(j, []).append((value, i))
+        kept = set()
+        for j in range(len(names)):
+            matches = [(value, i) for value, i in close.get(j, []) if i in kept]
+            if matches:
+                value, i = min(matches)
+                duplicates[names[j]] = (names[i], value)
+            else:
+                kept.add(j)
+
+    return duplicates
+
+def remove_duplicates(duplicates, threshold):
+    """moves the .xyz files of duplicate geometries to duplicates/ so that no inputs are made for them,
+    and lists them in {job_name}_duplicates.csv with the subjob each one duplicates and their RMSD"""
+    os.makedirs('duplicates', exist_ok=True)
+    with open(f'{job_name}_duplicates.csv', 'w') as report:
+        report.write(f'duplicate,kept,rmsd (angstrom)\n')
+        for subjob_name, (kept_name, rmsd) in sorted(duplicates.items()):
+            os.rename(f'{subjob_name}.xyz', os.path.join('duplicates', f'{subjob_name}.xyz'))
+            report.write(f'{subjob_name},{kept_name},{rmsd:.4f}\n')
+        report.write(f'# Geometries with an RMSD below {threshold} angstroms were moved to duplicates/ by {os.path.basename(__file__)} version {version}\n')
+    print(f'{len(duplicates)} duplicate geometries moved to duplicates/ and listed in {job_name}_duplicates.csv')
+
+def find_cached_results(settings_chain, cache_path):
+    """looks up every .xyz file of the working directory in the result cache and returns {subjob_name: entry directory} for the hits"""
+    hits = {}
+    for file in sorted(os.scandir('.'), key=lambda file: file.name):
+        if file.name.endswith('.xyz'):
+            subjob_name, charge, spin = get_subjob_properties(file.name)
+            with open(file, 'r') as f:
+                elements, coordinates = geometry_coordinates(f.readlines())
+            entry = result_cache_entry(cache_path, job_hash(settings_chain, charge, spin, elements, coordinates))
+            if os.path.isdir(entry):
+                hits[subjob_name] = entry
+    return hits
+
+def reuse_cached_results(hits, link=False):
+    """copies (or hard links, if link is True) the .out, .gbw and .hess files of each cache hit into the working directory
+    under the subjob's name, and moves its .xyz file to inputs/ so that no input is written for it"""
+    os.makedirs('inputs', exist_ok=True)
+    for subjob_name, entry in sorted(hits.items()):
+        with open(os.path.join(entry, 'entry.json'), 'r') as file:
+            source = json.load(file)
+        for filename in os.listdir(entry):
+            if filename == 'entry.json':
+                continue
+            target = subjob_name + filename[filename.index('.'):]
+            if link:
+                try:
+                    os.link(os.path.join(entry, filename), target)
+                    continue
+                except OSError:
+                    pass
+            shutil.copyfile(os.path.join(entry, filename), target)
+        os.rename(f'{subjob_name}.xyz', os.path.join('inputs', f'{subjob_name}_in.xyz'))
+        print(f'{subjob_name} reused from the result cache ({source["molecule name"]} in {source["source directory"]})')
+
+def generate_orca_input(settings_chain, memory_estimates, nprocs=None):
+    """Generates Orca input files and renames xyz files.
+    memory_estimates is a dictionary of {subjob_name: memory per core in MB}, which sets the %maxcore of each input.
+    nprocs is an optional dictionary of {subjob_name: cores}, which replaces the %pal nprocs of the settings files.
+    settings_chain is a list of settings files (as lists of lines). If there is more than one,
+    the jobs are chained with $new_job, and every job after an optimization starts from the optimized geometry"""
+    #dedup moves the duplicates to duplicates/ and lists them in {job_name}_duplicates.csv, which are not inputs
+    dedup_files = ('duplicates', f'{job_name}_duplicates.csv')
+    for file in os.scandir('.'):
+        if file.name.endswith('.xyz'):
+            subjob_name, charge, spin = get_subjob_properties(file.name)
+            write_orca_input(subjob_name, charge, spin, f'{subjob_name}_in.xyz', settings_chain, memory_estimates[subjob_name],
+                             None if nprocs == None else nprocs[subjob_name])
+            os.rename(file.name, f"{subjob_name}_in.xyz")
+            
+        elif file.name in dedup_files:
+            continue
+        else:
+            print(f'Error! Skipping {file.name} because it is not an .xyz file.')
+
+COMPRESSED = {'.gz': gzip, '.xz': lzma}
+
+def find_file(filename, directories=('.', 'job_files', 'inputs')):
+    """returns the path of a file in the working directory or the subdirectories process_orca_4 moves files to, or None
+    if the file itself is not found, a compressed copy (.gz from compress, or .gz/.xz from process_orca_4 --archive) is returned"""
+    for extension in [''] + list(COMPRESSED):
+        for directory in directories:
+            path = os.path.join(directory, f'{filename}{extension}')
+            if os.path.exists(path):
+                return os.path.normpath(path)
+    return None
+
+def open_compressed(path, mode='r'):
+    """opens a file found by find_file, decompressing it on the fly if it is compressed"""
+    extension = os.path.splitext(path)[1]
+    if extension in COMPRESSED:
+        return COMPRESSED[extension].open(path, 'rt' if mode == 'r' else mode)
+    return open(path, mode)
+
+def decompress_file(path, destination):
+    """decompresses a file found by find_file to destination, leaving the compressed file in place
+    Stops with an error if it cannot be decompressed, since the restart would otherwise not have its orbitals or Hessian"""
+    try:
+        with open_compressed(path, 'rb') as source, open(f'{destination}.tmp', 'wb') as target:
+            shutil.copyfileobj(source, target, 1024*1024)
+        os.replace(f'{destination}.tmp', destination)
+    except (OSError, EOFError, zlib.error, lzma.LZMAError) as error:
+        if os.path.exists(f'{destination}.tmp'):
+            os.remove(f'{destination}.tmp')
+        print(f'Error! {path} could not be decompressed to {destination} ({error}). Nothing is restarted.')
+        exit(1)
+
+def last_geometry(trj_path):
+    """returns the last frame of an orca _trj.xyz file (or any xyz file, possibly compressed) as a list of lines"""
+    with open_compressed(trj_path, 'r') as file:
+        lines = file.readlines()
+    frame_start = 0
+    n = 0
+    while n < len(lines) and lines[n].strip().isdigit():
+        frame_start = n
+        n += int(lines[n]) + 2
+    n_atoms = int(lines[frame_start])
+    return lines[frame_start:frame_start + n_atoms + 2]
+
+def original_settings(subjob_name):
+    """reads the settings of each job of a previous .inp file, without the lines written by this script
+    returns a list of settings files (as lists of lines), or None if the .inp file cannot be found"""
+    inp_path = find_file(f'{subjob_name}.inp')
+    if inp_path == None:
+        return None
+    GENERATED = ('%maxcore', '* xyzfile', '# this input file was created', '! moread', '%moinp', '%geom inhess read')
+
+    settings_chain = [[]]
+    with open_compressed(inp_path, 'r') as inp_file:
+        for line in inp_file:
+            if line.lower().startswith('$new_job'):
+                settings_chain.append([])
+            elif line.strip() and not line.lower().startswith(GENERATED):
+                settings_chain[-1].append(line)
+    return settings_chain
+
+def queued_subjobs():
+    """returns the names of the subjobs of the SLURM jobs submitted from this directory which are still queued or running,
+    read from the {script_name}_staging.txt manifest of each job listed by squeue.
+    Returns None if squeue cannot be run or a job has no manifest, since the running subjobs are then unknown"""
+    try:
+        queue = subprocess.run(['squeue', '--noheader', '--user', os.environ.get('USER', ''), '--format=%j %Z'],
+                               capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if queue.returncode != 0:
+        return None
+
+    subjob_names = set()
+    for line in queue.stdout.splitlines():
+        fields = line.split(maxsplit=1)
+        if len(fields) != 2 or os.path.realpath(fields[1]) != os.path.realpath('.'):
+            continue
+        if not os.path.exists(f'{fields[0]}_staging.txt'):
+            print(f'Warning! {fields[0]} is queued in this directory but {fields[0]}_staging.txt was not found.')
+            return None
+        with open(f'{fields[0]}_staging.txt', 'r') as manifest:
+            subjob_names.update(line.split()[0] for line in manifest if line.strip())
+    return subjob_names
+
+def still_writing(filename):
+    """whether an .out file was written in the last RUNNING_MINUTES minutes and does not end with a final ORCA banner,
+    i.e. whether orca is probably still running it"""
+    if not filename.endswith('.out') or time.time() - os.path.getmtime(filename) > RUNNING_MINUTES * 60:
+        return False
+    with open(filename, 'rb') as file:
+        file.seek(max(0, os.path.getsize(filename) - 4096))
+        tail = file.read().decode(errors='replace')
+    return '****ORCA TERMINATED NORMALLY****' not in tail and 'error termination' not in tail.lower()
+
+def error_terminated(filename):
+    """whether orca stopped an .out file (which may be compressed) with an error, rather than the job running out of time
+    only the end of an uncompressed file is read; a compressed one is streamed"""
+    with open_compressed(filename, 'rb') as file:
+        if os.path.splitext(filename)[1] not in COMPRESSED:
+            file.seek(max(0, os.path.getsize(filename) - 8192))
+        tail = b''.join(deque(file, maxlen=200)).decode(errors='replace').lower()
+    return 'error termination' in tail or 'aborting the run' in tail
+
+def find_restarts(settings_chain=None):
+    """finds the jobs in the working directory which did not terminate normally or whose geometry did not converge
+    Each is restarted from its first failed job, and any jobs chained after it are run again.
+    Optimizations which really failed (which finished without converging, or which orca stopped with an error) use the repair_opt or
+    repair_TS settings. Every other job, e.g. one that ran out of time, continues with its previous settings.
+    If settings_chain is given, it is used for every restart instead.
+    Jobs which are still queued or running are skipped (see queued_subjobs and still_writing).
+    Returns {subjob_name: restart}, where each restart is a dictionary of the .out file, settings chain, geometry lines,
+    charge, spin, previous %maxcore and the .gbw and .hess files to restart from (or None). Any of these files may be compressed"""
+    from process_orca_4_v2_25 import parse_directory, strip_compression
+
+    repair = {'opt': load_settings(f'{DEFAULT_PATH}/repair_opt'), 'optTS': load_settings(f'{DEFAULT_PATH}/repair_TS')}
+
+    running = queued_subjobs()
+    if running == None:
+        print(f'Warning! The SLURM queue could not be checked. .out files written in the last {RUNNING_MINUTES} minutes '
+              'without a final ORCA banner are taken to be running.')
+
+    restarts = {}
+    for filename, parsed, error in parse_directory('.'):
+        #outputs gzipped by compress (or archived) are named {subjob_name}.out.gz or .out.xz
+        try:
+            subjob_name, charge, spin = get_subjob_properties(strip_compression(filename))
+        except (IndexError, ValueError):
+            print(f'Warning! {filename} is not named {{molecule_name}}_{{charge}}_{{spin}}.out and is not restarted.')
+            continue
+        if running != None:
+            active = subjob_name in running
+        else:
+            active = still_writing(filename)
+        if active:
+            print(f'{subjob_name} is still queued or running and is not restarted.')
+            continue
+        if parsed is None:
+            print(f'Warning! {filename} could not be read ({error}) and is not restarted.')
+            continue
+        rows, neg_freq_info, details = parsed
+        previous = original_settings(subjob_name)
+
+        #jobs chained after a crash never get a row of their own
+        failed = [n for n, row in enumerate(rows) if row[4] == 'N/A' or row[9] is False]
+        if previous != None and len(rows) < len(previous):
+            failed.append(len(rows))
+        if not failed:
+            continue
+        first = failed[0]
+        maxcore = details[min(first, len(details) - 1)]['maxcore']
+        if first < len(rows):
+            job_type = rows[first][2]
+            #a job without a cost did not terminate: it failed only if orca stopped it with an error, and otherwise ran out of time
+            if rows[first][4] != 'N/A':
+                failure = 'did not converge'
+            elif error_terminated(filename):
+                failure = 'stopped with an error'
+            else:
+                failure = 'ran out of time'
+        else:
+            commands = ''.join(line.lower() for line in previous[first] if line.startswith('!'))
+            job_type = 'optTS' if 'optts' in commands else 'opt' if 'opt' in commands else 'SP'
+            failure = 'never started'
+        repaired = job_type in repair and failure in ('did not converge', 'stopped with an error')
+
+        if settings_chain != None:
+            chain = settings_chain
+        elif previous != None and first < len(previous):
+            chain = previous[first:]
+            if repaired:
+                chain[0] = repair[job_type]
+        elif job_type in repair:
+            print(f'Warning! The input of {subjob_name} could not be found, so its {job_type} is restarted with the repair settings.')
+            chain = [repair[job_type]]
+            repaired = True
+        else:
+            print(f'Warning! The input of {subjob_name} could not be found. It is not restarted.')
+            continue
+
+        #the last geometry of the optimization, or else the optimized or starting geometry
+        geometry_path = (find_file(f'{subjob_name}_trj.xyz') or find_file(f'{subjob_name}.xyz')
+                         or find_file(f'{subjob_name}_restart_in.xyz') or find_file(f'{subjob_name}_in.xyz'))
+        if geometry_path == None:
+            print(f'Warning! No geometry was found for {subjob_name}. It is not restarted.')
+            continue
+
+        #the Hessian is only read if the settings do not calculate their own
+        hess = None
+        commands = ''.join(line.lower() for line in chain[0] if line.startswith('!'))
+        if 'opt' in commands and not any('calc_hess true' in ' '.join(line.lower().split()) for line in chain[0]):
+            hess = find_file(f'{subjob_name}.hess') or find_file(f'{subjob_name}_restart.hess')
+
+        restarts[subjob_name] = {
+            'output': filename,
+            'settings': chain,
+            'geometry': last_geometry(geometry_path),
+            'charge': charge,
+            'spin': spin,
+            'maxcore': maxcore,
+            'gbw': find_file(f'{subjob_name}.gbw') or find_file(f'{subjob_name}_restart.gbw'),
+            'hess': hess}
+        print(f'{subjob_name}: restarting {job_type} (job {first + 1}, which {failure}) from {geometry_path}'
+              + (' with the repair settings' if repaired and settings_chain == None else ''))
+
+    return restarts
+
+def generate_restart_inputs(restarts, memory_estimates, nprocs=None):
+    """Generates Orca input files to restart jobs (see find_restarts).
+    The previous .out file is moved to job_files/{subjob_name}_failed{n}.out (.out.gz if it was compressed) so the restart writes a fresh one.
+    The previous .gbw and .hess files are renamed {subjob_name}_restart.gbw/.hess, since orca cannot read orbitals
+    from the file it is about to overwrite, and the last geometry is saved as {subjob_name}_restart_in.xyz
+    Compressed .gbw and .hess files are decompressed to these names before anything else is moved, so a file which
+    cannot be decompressed stops the restart with the working directory unchanged"""
+    os.makedirs('job_files', exist_ok=True)
+    for subjob_name, restart in restarts.items():
+        for key in ('gbw', 'hess'):
+            if restart[key] != None and os.path.splitext(restart[key])[1] in COMPRESSED:
+                decompress_file(restart[key], f'{subjob_name}_restart.{key}')
+
+    for subjob_name, restart in restarts.items():
+        n = 1
+        while any(os.path.exists(f'job_files/{subjob_name}_failed{n}.out{extension}') for extension in [''] + list(COMPRESSED)):
+            n += 1
+        extension = restart['output'][len(f'{subjob_name}.out'):]
+        os.replace(restart['output'], f'job_files/{subjob_name}_failed{n}.out{extension}')
+
+        staged = {}
+        for key in ('gbw', 'hess'):
+            if restart[key] == None:
+                staged[key] = None
+                continue
+            staged[key] = f'{subjob_name}_restart.{key}'
+            if os.path.splitext(restart[key])[1] in COMPRESSED:
+                os.remove(restart[key])
+            else:
+                os.replace(restart[key], staged[key])
+        moread = staged['gbw']
+        hess = staged['hess']
+
+        geometry = f'{subjob_name}_restart_in.xyz'
+        with open(geometry, 'w') as xyz_file:
+            xyz_file.writelines(restart['geometry'])
+
+        write_orca_input(subjob_name, restart['charge'], restart['spin'], geometry, restart['settings'],
+                         memory_estimates[subjob_name], None if nprocs == None else nprocs[subjob_name], moread, hess)
+
+def staging_files(subjob_name):
+    """lists the files one subjob needs on scratch: its .inp file and every geometry, MORead orbital file
+    and input Hessian named in it which exists in the working directory"""
+    files = [f'{subjob_name}.inp']
+    with open(f'{subjob_name}.inp', 'r') as inp_file:
+        for line in inp_file:
+            words = line.replace('"', ' ').split()
+            if line.startswith('* xyzfile'):
+                names = words[4:5]
+            elif any(keyword in line.lower() for keyword in ('%moinp', 'inhessname')):
+                names = words
+            else:
+                continue
+            for name in names:
+                if os.path.exists(name) and name not in files:
+                    files.append(name)
+    return files
+
+def write_staging_manifest(script_name, subjob_names):
+    """writes {script_name}_staging.txt, which lists each subjob followed by the files it stages to scratch
+    returns the staging files as a dictionary of {subjob_name: [files]}"""
+    staging = {subjob_name: staging_files(subjob_name) for subjob_name in subjob_names}
+    with open(f'{script_name}_staging.txt', 'w') as manifest:
+        manifest.writelines(f'{subjob_name} {" ".join(files)}\n' for subjob_name, files in staging.items())
+    return staging
+
+def slurm_subjob_lines(script_name, subjob_names, slots=None):
+    """the lines of a SLURM script which run each subjob in turn
+    each subjob stages only its own files to scratch and its results are copied back as soon as it finishes
+    if slots is given, up to that many subjobs run at once and the next one starts as soon as a slot frees up.
+    Their mpiruns are then started with --bind-to none (passed on by orca), since each would otherwise bind its
+    processes to the first cores of the node, on top of the other subjobs"""
+    staging = write_staging_manifest(script_name, subjob_names)
+    slurm_subjobs = ''
+    if slots != None:
+        slurm_subjobs += f"""# Waits until fewer than {slots} subjobs are running
+wait_for_slot () {{
+    while [ $(jobs -rp | wc -l) -ge {slots} ]; do
+        wait -n
+    done
+}}
+
+"""
+    for subjob_name in subjob_names:
+        sources = ' '.join(f'$SLURM_SUBMIT_DIR/{file}' for file in staging[subjob_name])
+        mpirun_options = ' "--bind-to none"' if slots != None and slots > 1 else ''
+        lines = (f'cp {sources} $TMPDIR/\n'
+                 f'$ORCA {subjob_name}.inp{mpirun_options} >> $SLURM_SUBMIT_DIR/{subjob_name}.out\n'
+                 f'copy_back {subjob_name}\n')
+        if slots == None:
+            slurm_subjobs += lines
+        else:
+            slurm_subjobs += 'wait_for_slot\n{\n'
+            slurm_subjobs += ''.join(f'    {line}\n' for line in lines.splitlines())
+            slurm_subjobs += '} &\n'
+    if slots != None:
+        slurm_subjobs += 'wait\n'
+    return slurm_subjobs
+
+def copy_back_function(compress_size=None):
+    """the bash function which copies the results of one subjob from scratch to the submit directory
+    only the files orca names after the subjob are copied: {subjob_name}.* (subjob names have no '.') and the _trj.xyz and _property.txt files.
+    {subjob_name}_* would also match the files of other subjobs whose names start with this one's, which share scratch with slots.
+    temporary files and the staged .inp file are skipped. If compress_size is given (in MB), larger files are gzipped
+    and the uncompressed copy an earlier run may have left in the submit directory is removed, since find_file would pick it first"""
+    if compress_size == None:
+        copy = 'cp $file $SLURM_SUBMIT_DIR/'
+    else:
+        copy = (f'if [ $(stat -c %s $file) -gt {compress_size * 1000000} ]; then gzip -c $file > $SLURM_SUBMIT_DIR/$file.gz && rm -f $SLURM_SUBMIT_DIR/$file; '
+                f'else cp $file $SLURM_SUBMIT_DIR/; fi')
+
+    return f"""copy_back () {{
+    for file in $1.* $1_trj.xyz $1_property.txt; do
+        [ -e "$file" ] || continue
+        case $file in
+            *.tmp*|$1.inp) ;;
+            *) {copy} ;;
+        esac
+    done
+}}"""
+
+def generate_slurm_script(job_name, job_time, ncores, total_memory, email, version, slurm_subjobs, script_name=None, compress_size=None):
+    """Generates the SLURM .sh script. It is saved as {script_name}.sh, which defaults to the job name.
+    slurm_subjobs stage their own files to scratch and call copy_back (see slurm_subjob_lines)"""
+    if script_name == None:
+        script_name = job_name
+
+    slurm = f"""#!/bin/bash
+#SBATCH -J {script_name}
+#SBATCH -t {job_time}
+#SBATCH -N 1
+#SBATCH --ntasks-per-node={ncores}
+#SBATCH --mem {total_memory}G
+#SBATCH --mail-user={email}
+#SBATCH --mail-type=all
+
+# This shell file was created with {os.path.basename(__file__)} version {version}
+
+# Unload all loaded modules and reset everything to the original state;
+# then load ORCA binaries and set communication protocol
+module purge
+module use /project/carrow/downloads/apps/modules
+module add orca
+
+# Copies the results of one subjob back to the working directory, skipping temporary files
+{copy_back_function(compress_size)}
+
+# Each subjob copies only its own input files (listed in {script_name}_staging.txt) to a temporary directory,
+# and its results are copied back to the working directory as soon as it finishes
+cd $TMPDIR
+ORCA=`which orca`
+echo $ORCA
+
+# Subjobs
+{slurm_subjobs}
+cd $SLURM_SUBMIT_DIR
+"""
+
+    with open(f'{script_name}.sh', 'w') as slurm_file:
+        slurm_file.write(slurm)
+
+def generate_array_script(job_name, job_time, ncores, total_memory, email, version, subjob_names, throttle, script_name=None, compress_size=None):
+    """Generates a SLURM .sh script which runs each subjob as one task of a job array.
+    The subjob names are written to {script_name}_manifest.txt, and task n runs the nth line of it.
+    Each task only stages its own input files (listed in {script_name}_staging.txt), so one failed subjob does not hold up the rest.
+    throttle limits how many tasks run at once (0 means no limit).
+    The script is saved as {script_name}.sh, which defaults to the job name."""
+    if script_name == None:
+        script_name = job_name
+
+    with open(f'{script_name}_manifest.txt', 'w') as manifest:
+        manifest.writelines(f'{subjob_name}\n' for subjob_name in subjob_names)
+    write_staging_manifest(script_name, subjob_names)
+
+    array = f'1-{len(subjob_names)}'
+    if throttle > 0:
+        array += f'%{throttle}'
+
+    slurm = f"""#!/bin/bash
+#SBATCH -J {script_name}
+#SBATCH -t {job_time}
+#SBATCH -N 1
+#SBATCH --ntasks-per-node={ncores}
+#SBATCH --mem {total_memory}G
+#SBATCH --array={array}
+#SBATCH --mail-user={email}
+#SBATCH --mail-type=all
+
+# This shell file was created with {os.path.basename(__file__)} version {version}
+# Each array task runs one line of {script_name}_manifest.txt
+
+# Unload all loaded modules and reset everything to the original state;
+# then load ORCA binaries and set communication protocol
+module purge
+module use /project/carrow/downloads/apps/modules
+module add orca
+
+# Copies the results of one subjob back to the working directory, skipping temporary files
+{copy_back_function(compress_size)}
+
+# Finds this task's subjob and the files it needs
+SUBJOB=`sed -n "${{SLURM_ARRAY_TASK_ID}}p" $SLURM_SUBMIT_DIR/{script_name}_manifest.txt`
+FILES=`sed -n "${{SLURM_ARRAY_TASK_ID}}p" $SLURM_SUBMIT_DIR/{script_name}_staging.txt | cut -d' ' -f2-`
+
+# Copy this subjob's input files to a temporary directory,
+# launch the job, and copy results back to the working directory
+for file in $FILES; do
+    cp $SLURM_SUBMIT_DIR/$file $TMPDIR/
+done
+cd $TMPDIR
+ORCA=`which orca`
+echo $ORCA
+
+$ORCA $SUBJOB.inp >> $SLURM_SUBMIT_DIR/$SUBJOB.out
+copy_back $SUBJOB
+
+cd $SLURM_SUBMIT_DIR
+"""
+
+    with open(f'{script_name}.sh', 'w') as slurm_file:
+        slurm_file.write(slurm)
+
+def group_by_memory(memory_estimates, memory_classes):
+    """groups subjobs by the smallest memory class (MB per core) that fits their memory estimate
+    estimates larger than every class get a class of their own, rounded up to the next 1000MB
+    returns {memory_class: [subjob names]} in order of increasing memory class"""
+    groups = {}
+    for subjob_name in sorted(memory_estimates):
+        estimate = memory_estimates[subjob_name]
+        fitting = [memory_class for memory_class in memory_classes if memory_class >= estimate]
+        if fitting:
+            memory_class = min(fitting)
+        else:
+            memory_class = 1000 * math.ceil(estimate / 1000)
+        groups.setdefault(memory_class, []).append(subjob_name)
+
+    return dict(sorted(groups.items()))
+
+def plan_group(script_name, subjob_names, job_time, ncores, options, estimates):
+    """Splits one group of subjobs which share a memory request into allocations, each written as one SLURM .sh script.
+    Depending on the options, the group is run one subjob after another, as a job array, or packed into bins.
+    With slots, each allocation runs min(slots, its subjobs) subjobs at once, each on its share of the cores,
+    and its time is sized from the estimates on that share (see slot_plan).
+    estimates is a dictionary of {cores: {subjob_name: hours}}. If job_time is None, it is sized from the estimates.
+    Returns a list of allocations, each a dictionary of its script name, subjob names, job time, the number of subjobs
+    run at once and the cores of each (both None without slots), and the array throttle (None unless array)."""
+    slots = options.get('slots')
+
+    # One SLURM job array with one task per subjob
+    if 'array' in options:
+        if job_time == None:
+            job_time = hours_to_time(max(max(estimates[ncores][subjob_name] for subjob_name in subjob_names) * TIME_SAFETY_FACTOR, MIN_BIN_TIME))
+            print(f'{script_name}: job time set to {job_time} from the resource estimates')
+        print(f'Submitting {len(subjob_names)} subjobs as a job array. The job time {job_time} applies to each subjob.')
+        return [{'script': script_name, 'subjobs': subjob_names, 'time': job_time, 'slots': None, 'cores': None,
+                 'array': options['array']}]
+
+    # One SLURM .sh script per bin, each with a wall time sized to its subjobs
+    if 'bins' in options:
+        #the estimates are packed against the target less the safety margin, so each requested time fits the target
+        target = time_to_hours(options['bins']) / TIME_SAFETY_FACTOR
+        group_estimates = {cores: {subjob_name: estimates[cores][subjob_name] for subjob_name in subjob_names} for cores in estimates}
+        if slots == None:
+            bins = pack_subjobs(group_estimates[ncores], target)
+        else:
+            bins = pack_slot_subjobs(group_estimates, target, ncores, slots)
+        print(f'Packed {len(subjob_names)} subjobs into {len(bins)} allocations.')
+        allocations = []
+        for n, bin_ in enumerate(bins, start=1):
+            allocation = {'script': f'{script_name}_bin{n}', 'subjobs': bin_, 'slots': None, 'cores': None, 'array': None}
+            if slots == None:
+                load = sum(estimates[ncores][subjob_name] for subjob_name in bin_)
+                message = f'{len(bin_)} subjobs'
+            else:
+                allocation['slots'] = min(slots, len(bin_))
+                allocation['cores'], load = slot_plan(bin_, estimates, ncores, slots)
+                message = f'{len(bin_)} subjobs, {allocation["slots"]} at once on {allocation["cores"]} cores each'
+            allocation['time'] = hours_to_time(max(load * TIME_SAFETY_FACTOR, MIN_BIN_TIME))
+            print(f'{allocation["script"]}.sh: {message}, estimated {load:.2f} h, requesting {allocation["time"]}')
+            allocations.append(allocation)
+        return allocations
+
+    # One SLURM .sh script for the whole group
+    allocation = {'script': script_name, 'subjobs': subjob_names, 'time': job_time, 'slots': None, 'cores': None, 'array': None}
+    if slots == None:
+        hours = sum(estimates[ncores][subjob_name] for subjob_name in subjob_names)
+    else:
+        allocation['slots'] = min(slots, len(subjob_names))
+        allocation['cores'], hours = slot_plan(subjob_names, estimates, ncores, slots)
+        print(f'{script_name}: running {allocation["slots"]} subjobs at once with {allocation["cores"]} cores each')
+    if job_time == None:
+        allocation['time'] = hours_to_time(max(hours * TIME_SAFETY_FACTOR, MIN_BIN_TIME))
+        print(f'{script_name}: job time set to {allocation["time"]} from the resource estimates')
+    return [allocation]
+
+def generate_allocation_script(allocation, ncores, total_memory, options):
+    """Generates the SLURM .sh script of one allocation planned by plan_group, once its inputs have been written.
+    Returns the name of the .sh file written."""
+    script_name = allocation['script']
+    if allocation['array'] != None:
+        generate_array_script(job_name, allocation['time'], ncores, total_memory, email, version, allocation['subjobs'],
+                              allocation['array'], script_name, options.get('compress'))
+    else:
+        slurm_subjobs = slurm_subjob_lines(script_name, allocation['subjobs'], allocation['slots'])
+        generate_slurm_script(job_name, allocation['time'], ncores, total_memory, email, version, slurm_subjobs, script_name,
+                              options.get('compress'))
+    return f'{script_name}.sh'
+
+def main():
+    job_time, memory_per_core, settings_paths, options = assign_arguments(arg_list)
+    
+    if settings_paths == None and 'restart' not in options:
+        # selection menu of default orca settings
+        settings = sorted(os.listdir(DEFAULT_PATH))
+       
+        print(f"""
+Welcome to the Carrow Lab's interactive Orca input handler!
+Default files can be found/edited at {DEFAULT_PATH}
+Please use a number key to choose a setting.
+To chain several jobs with $new_job, separate the numbers with commas (e.g. 3,1).""")
+        for index, option in enumerate(settings, start=1):
+            print(indent(index, f'{index} {option}'))
+
+        choices = input(' > ').split(',')
+        settings_paths = []
+        for choice in choices:
+            if choice.strip().isdigit() and 1 <= int(choice) <= len(settings):
+                settings_paths.append(f'{DEFAULT_PATH}/{settings[int(choice) - 1]}')
+            else:
+                print('Invalid choice!')
+                sys.exit(1)
+    
+    #loads settings and cleans them
+    settings_chain = None
+    if settings_paths != None:
+        settings_chain = [load_settings(settings_path) for settings_path in settings_paths]
+        for settings_lines in settings_chain:
+            print(settings_lines[0][:-1])
+
+    if 'restart' in options:
+        #restarts are run as a separate batch, named so that the original .sh files are not overwritten
+        batch_name = f'{job_name}_restart'
+        restarts = find_restarts(settings_chain)
+        if not restarts:
+            print('There are no failed or unconverged jobs to restart.')
+            open(f'{job_name}_scripts.txt', 'w').close()
+            sys.exit(0)
+        subjob_chains = {subjob_name: restart['settings'] for subjob_name, restart in restarts.items()}
+        subjob_elements = {subjob_name: geometry_elements(restart['geometry']) for subjob_name, restart in restarts.items()}
+    else:
+        batch_name = job_name
+
+        #checks for .xyz files and throws error if there are none
+        xyz_present = False
+        for file in os.scandir('.'):
+            if file.name.endswith('.xyz'):
+                xyz_present = True
+                break
+        if xyz_present == False:
+            print('There are no xyz files! Terminating the script.')
+            sys.exit(1)
+
+        #duplicate geometries are moved away before anything is estimated or written for them
+        if 'dedup' in options:
+            duplicates = find_duplicates(options['dedup'])
+            if duplicates:
+                remove_duplicates(duplicates, options['dedup'])
+            else:
+                print(f'No duplicate geometries found (RMSD below {options["dedup"]} angstroms)')
+
+        #jobs which have already been run with the same settings, charge, spin and geometry are not run again
+        if 'cache' in options:
+            hits = find_cached_results(settings_chain, RESULT_CACHE_PATH)
+            reuse_cached_results(hits, options['cache'] == 'link')
+            print(f'{len(hits)} subjobs found in the result cache ({RESULT_CACHE_PATH})')
+            if not any(file.name.endswith('.xyz') for file in os.scandir('.')):
+                print('Every subjob was found in the result cache. Nothing to submit.')
+                open(f'{job_name}_scripts.txt', 'w').close()
+                sys.exit(0)
+    
+        #reads the atoms of each subjob before the xyz files are renamed
+        subjob_elements = {}
+        for file in os.scandir('.'):
+            if file.name.endswith('.xyz'):
+                subjob_elements[get_subjob_properties(file.name)[0]] = element_count(file)
+        subjob_chains = {subjob_name: settings_chain for subjob_name in subjob_elements}
+    subjob_atoms = {subjob_name: count_rows(elements) for subjob_name, elements in subjob_elements.items()}
+        
+    #determines ncores from settings files. The allocation is sized for the largest of them.
+    ncores = None
+    for chain in subjob_chains.values():
+        for settings_lines in chain:
+            if settings_ncores(settings_lines) == None:
+                print('Error! Settings file must contain %pal NPROCS')
+                exit(1)
+            ncores = max(ncores or 0, settings_ncores(settings_lines))
+
+    #the resource model fitted from previous outputs is preferred if it covers these settings.
+    #Otherwise the estimate from the number of basis functions is used, and the rough estimates are the last resort
+    predictions = {}
+    fitted = 0
+    basis_table = load_basis_table(BASIS_PATH)
+    models = {}
+    for subjob_name, chain in subjob_chains.items():
+        if id(chain) not in models:
+            models[id(chain)] = load_resource_model(MODEL_PATH, chain)
+        if models[id(chain)] != None:
+            predictions[subjob_name] = predict_resources(models[id(chain)], subjob_atoms[subjob_name], ncores)
+            fitted += 1
+        else:
+            prediction = predict_analytic(chain, subjob_elements[subjob_name], basis_table, ncores)
+            if prediction != None:
+                predictions[subjob_name] = prediction
+    if fitted:
+        print(f'Using the resource model fitted to previous jobs ({MODEL_PATH}) for {fitted} of {len(subjob_chains)} subjobs')
+    if len(predictions) > fitted:
+        print(f'Estimating resources from the number of basis functions for {len(predictions) - fitted} of {len(subjob_chains)} subjobs')
+
+    #estimates memory demands of each subjob based on xyz file contents if no memory was specified.
+    #restarts keep at least the memory they had before
+    if memory_per_core == None:
+        memory_estimates = {}
+        for subjob_name, atoms in subjob_atoms.items():
+            if subjob_name in predictions:
+                memory_estimates[subjob_name] = predictions[subjob_name][0]
+            else:
+                memory_estimates[subjob_name] = estimate_memory(atoms)
+            if 'restart' in options and restarts[subjob_name]['maxcore'] != None:
+                memory_estimates[subjob_name] = max(memory_estimates[subjob_name], restarts[subjob_name]['maxcore'])
+        print(f'memory per core estimated to be {min(memory_estimates.values())}-{max(memory_estimates.values())}MB')
+    else:
+        memory_estimates = {subjob_name: memory_per_core for subjob_name in subjob_atoms}
+
+    #groups subjobs into memory classes so that each allocation only requests the memory its own subjobs need
+    groups = group_by_memory(memory_estimates, MEMORY_CLASSES)
+    total_memories = {}
+    for memory_class, group in groups.items():
+        total_memories[memory_class] = math.ceil(max(memory_estimates[subjob_name] for subjob_name in group) * ncores / 1000)
+        if total_memories[memory_class] > MAX_ALLOWED_MEM:
+            print(f'Error! excessive memory ({total_memories[memory_class]}G) requested for {", ".join(group)}!')
+            print(f'Lower memory below {MAX_ALLOWED_MEM}G by lowering %pal nprocs or')
+            print(f'specifying a lower memory_per_core on as an argument (e.g. launch_orca_4 2000M)')
+            exit(1)
+
+    #estimates the time of each subjob
+    if 'bins' in options and 'array' in options:
+        print('Error! array and bins cannot be used together')
+        exit(1)
+    if 'slots' in options and 'array' in options:
+        print('Error! array and slots cannot be used together')
+        exit(1)
+    if 'slots' in options and not 1 <= options['slots'] <= ncores:
+        print(f'Error! slots must be between 1 and the {ncores} cores of the allocation')
+        exit(1)
+
+    #with job slots, a subjob runs on ncores // K cores when K subjobs share the allocation, so its time is predicted on each of these
+    core_counts = {ncores}
+    if 'slots' in options:
+        core_counts |= {ncores // running for running in range(1, options['slots'] + 1)}
+    estimates = {cores: {} for cores in core_counts}
+    for subjob_name, atoms in subjob_atoms.items():
+        chain = subjob_chains[subjob_name]
+        for cores in core_counts:
+            if models[id(chain)] != None:
+                estimates[cores][subjob_name] = predict_resources(models[id(chain)], atoms, cores)[1]
+            elif subjob_name in predictions:
+                estimates[cores][subjob_name] = predict_analytic(chain, subjob_elements[subjob_name], basis_table, cores)[1]
+            else:
+                #the rough estimate is of the subjob on the whole allocation
+                estimates[cores][subjob_name] = estimate_time(atoms) * len(chain) * ncores / cores
+
+    #the job time is only set from the estimates if every subjob has a fitted or basis function estimate
+    if job_time == None and len(predictions) < len(subjob_atoms):
+        print(f'No job time provided. Setting job time to {DEFAULT_TIME}')
+        job_time = DEFAULT_TIME
+
+    # Plan the allocations of each memory class
+    allocations = []
+    for memory_class, group in groups.items():
+        if len(groups) == 1:
+            script_name = batch_name
+        else:
+            script_name = f'{batch_name}_mem{memory_class}'
+            print(f'{script_name}: {len(group)} subjobs with up to {memory_class}MB per core ({total_memories[memory_class]}G)')
+        for allocation in plan_group(script_name, group, job_time, ncores, options, estimates):
+            allocation['memory'] = total_memories[memory_class]
+            allocations.append(allocation)
+
+    #with job slots, each input runs on its share of the cores of its allocation
+    nprocs = None
+    if 'slots' in options:
+        nprocs = {subjob_name: allocation['cores'] for allocation in allocations for subjob_name in allocation['subjobs']}
+
+    # Generate Orca input files and rename xyz files
+    if 'restart' in options:
+        generate_restart_inputs(restarts, memory_estimates, nprocs)
+    else:
+        generate_orca_input(settings_chain, memory_estimates, nprocs)
+
+    # Generate the SLURM .sh scripts
+    scripts = [generate_allocation_script(allocation, ncores, allocation['memory'], options) for allocation in allocations]
+
+    #lists the .sh files for launch_orca_4 to submit
+    with open(f'{job_name}_scripts.txt', 'w') as scripts_file:
+        scripts_file.writelines(f'{script}\n' for script in scripts)
+
+if __name__ == '__main__':
+    arg_list = sys.argv[3:]
+    email = sys.argv[1]
+    DEFAULT_PATH = f'{sys.argv[2]}/python_scripts/orca_settings/'
+    DEFAULT_TIME = '1:00:00'
+    MAX_ALLOWED_MEM = 120
+    TIME_SAFETY_FACTOR = 1.5
+    MIN_BIN_TIME = 0.25
+    MEMORY_CLASSES = [1000, 1500, 2000, 3000, 4000, 6000, 8000, 12000, 16000]
+    MODEL_PATH = f'{sys.argv[2]}/python_scripts/resource_model.json'
+    BASIS_PATH = f'{sys.argv[2]}/python_scripts/basis_functions.json'
+    RESULT_CACHE_PATH = f'{sys.argv[2]}/result_cache'
+    RUNNING_MINUTES = 30
+    job_name = os.path.basename(os.getcwd())
+    version = edit_history.strip().split('\n')[-1].split()[0]
+    main()
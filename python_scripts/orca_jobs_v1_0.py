@@ -0,0 +1,90 @@
+"""
+This module holds the functions that launch_orca_4 and process_orca_4 must agree on, so neither script imports the other for them.
+The result cache keys (job_hash) are written by process_orca_4 --result-cache and looked up by launch_orca_4 cache,
+and the resource model features (count_rows, memory_features, time_features) are fitted by process_orca_4 --fit-model
+and used for predictions by launch_orca_4.
+It is imported by both scripts and is not run on its own.
+"""
+
+#####################
+###Version Control###
+#####################
+
+#(since I will probably not convince the Carrow lab to use Github)
+#Update this comment whenever edits are made.
+
+edit_history = """
+version Initials    Date            Summary
+1.0     ARS         17-Oct-2026     job_hash and the resource model features are moved here from launch_orca_4_v3_16.py
+"""
+
+import math
+import os
+import hashlib
+
+def count_rows(elements):
+    """takes a dictionary of {element: count} and returns the number of atoms from each row of the periodic table.
+    Atoms in rows 6 and 7 are both partitioned into n6. Unrecognized atoms are also counted in n6 (with a warning)
+    so that the estimates err on the high side"""
+
+    periods = (
+        ('H', 'He'),
+        ('Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne'),
+        ('Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar'),
+        ('K', 'Ca', 'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr'),
+        ('Rb', 'Sr', 'Y', 'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe'),
+        ('Cs', 'Ba', 'La', 'Ce', 'Pr', 'Nd', 'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb', 'Lu',
+         'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg', 'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn'),
+        ('Fr', 'Ra', 'Ac', 'Th', 'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm', 'Bk', 'Cf', 'Es', 'Fm', 'Md', 'No', 'Lr',
+         'Rf', 'Db', 'Sg', 'Bh', 'Hs', 'Mt', 'Ds', 'Rg', 'Cn', 'Nh', 'Fl', 'Mc', 'Lv', 'Ts', 'Og'))
+    #mind the off by one: rows 6 and 7 share n6
+    row_of = {atom: min(row, 5) for row, period in enumerate(periods) for atom in period}
+
+    n_atoms = [0,0,0,0,0,0]
+
+    for atom, count in elements.items():
+        if atom not in row_of:
+            print(f'Warning! {atom} is not a recognized element. It is counted as a row 6 atom.')
+        n_atoms[row_of.get(atom, 5)] += count
+
+    return n_atoms
+
+def memory_features(atom_count):
+    """features of the fitted memory model: a constant and the number of atoms in each row of the periodic table"""
+    return [1] + list(atom_count)
+
+def time_features(atom_count):
+    """features of the fitted time model (which predicts the log of the cost): a constant and the log of the atom counts
+    rows 4-6 are combined since few jobs contain them"""
+    n1, n2, n3, n4, n5, n6 = atom_count
+    return [1, math.log1p(n1), math.log1p(n2), math.log1p(n3), math.log1p(n4 + n5 + n6)]
+
+def hash_settings_lines(settings_lines):
+    """returns the lines of a settings file that decide the result of a job, normalized for the result cache.
+    Comments, blank lines and the lines that only set resources or are written by launch_orca_4 (%pal, %maxcore, * xyzfile, MORead)
+    are left out, and the case and spacing of the rest are normalized"""
+    IGNORED = ('#', '%pal', '%maxcore', '* xyz', '*xyz', '! moread', '%moinp', '%geom inhess read')
+    lines = []
+    for line in settings_lines:
+        line = ' '.join(line.lower().split())
+        if line and not line.startswith(IGNORED):
+            lines.append(line)
+    return lines
+
+def job_hash(settings_chain, charge, spin, elements, coordinates):
+    """returns the key of a job in the result cache: a sha256 of its settings (see hash_settings_lines), charge, spin and geometry.
+    The key is not canonical. Only the translation of the geometry is removed (it is centered on its centroid) before it is rounded
+    to 0.001 angstroms, so a translated copy of an input has the same key, but a rotated copy or one with its atoms in another order does not.
+    This is deliberate: the cached .out, .gbw and .hess files are in the orientation and atom order of the input they came from,
+    so they can only stand in for an input with the same ones. Two coordinates on either side of a rounding boundary (0.0005 angstroms)
+    also give different keys, so the cache finds copies of an input rather than geometries which are merely close (see dedup for those)"""
+    centroid = [sum(coordinate[k] for coordinate in coordinates) / len(coordinates) for k in range(3)]
+    geometry = [f'{element} ' + ' '.join(f'{coordinate[k] - centroid[k]:.3f}' for k in range(3)).replace('-0.000', '0.000')
+                for element, coordinate in zip(elements, coordinates)]
+    settings = ['\n'.join(hash_settings_lines(settings_lines)) for settings_lines in settings_chain]
+    content = '\n$new_job\n'.join(settings) + f'\n* {charge} {spin}\n' + '\n'.join(geometry)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def result_cache_entry(cache_path, key):
+    """returns the directory of a job in the result cache. An entry only exists once it is complete"""
+    return os.path.join(cache_path, key[:2], key)
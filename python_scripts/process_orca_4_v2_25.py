@@ -0,0 +1,1617 @@
+""" 
+This script processes orca 4.2.1 .out files and creates a .csv file summarizing the results.
+For each .out file (or each job of an .out file with $new_job), the following are tallied:
+['molecule name', 'command line', 'job type', 'freq?', 'cost (cpu*hr)', 'E', 'H', 'G', 'neg freq', 'geom converged?']
+This script creates a single .csv file with every result.
+It also writes an animation ({molecule_name}.hess.v{mode}.xyz, as orca_pltvib names them) of every negative frequency,
+reading the normal modes from the .hess files with numpy. Without numpy (or with --pltvib), it instead creates
+a shell script (neg_freqs.sh) which visualizes them with orca_pltvib
+{job_name}_timings.csv lists the optimization cycles, SCF iterations and the time orca spent in each module (seconds) of every job,
+and {job_name}_cost_by_settings.csv adds up the cost of each command line and splits it between the modules.
+
+By default, this script takes no arguments, and operates on every file with the .out extension in a directory
+It also reads the directory name and uses it as a constant.
+Optional arguments:
+    -j N, --workers N   parses the .out files on a pool of N processes (0 uses every available core)
+    -r, --recursive     walks every directory under the working directory and writes one {job_name}_campaign_summary.csv
+                        with a 'source directory' column instead of the usual summary and neg_freqs.sh
+    --sqlite DB         also upserts one row per .out file into the results table of the SQLite database DB.
+                        The table is indexed on molecule name, job type and command line,
+                        and the summary view returns it with the .csv column names.
+                        Rows of outputs that are no longer in a summarized directory are deleted.
+    --fit-model PATH    fits the launch_orca_4 resource model (memory per core and cost per settings file)
+                        to the peak memory (or else the %maxcore) and cost of the normally terminated .out files
+                        and saves it to PATH. Requires numpy.
+    --watch [SECONDS]   reports the progress of the running jobs every SECONDS (default 60) until interrupted with Ctrl-C,
+                        instead of summarizing them. Only the bytes appended to each .out file since the last refresh are read.
+                        --watch 0 reports once.
+    --npz               also writes the final geometry, element list, charge, spin and every frequency of each job to
+                        {job_name}_geometries.npz (one per directory with -r), a columnar archive indexed by molecule name
+                        that load_geometry_store() memory-maps. Requires numpy.
+    --result-cache [DIR]
+                        adds every normally terminated job (with a converged geometry) to the lab's result cache in DIR
+                        (default $CARROW_CODEBASE/result_cache), keyed by a hash of its settings, charge, spin and starting geometry,
+                        so that launch_orca_4 cache can reuse its .out, .gbw and .hess files instead of running it again.
+                        Entries are renamed into place once complete, so several users can fill the cache at once.
+    --archive [CODEC]   compresses the .out files of the jobs that terminated normally and converged, and their files in job_files/
+                        with gzip (default) or lzma (on N processes with -j N, and in every directory with -r) instead of summarizing them.
+                        Archived .out and .hess files (.gz or .xz) are read directly, so archived directories can still be processed.
+    --thermo            recomputes H, T*S and G of every freq job from its parsed frequencies, mass, symmetry number and
+                        rotational constants at every combination of --temperatures, --concentrations and --qrrho,
+                        without rerunning the freq jobs, and writes them to {job_name}_thermochemistry.csv. Requires numpy.
+    --temperatures K [K ...]
+                        temperatures for --thermo (default 298.15)
+    --concentrations C [C ...]
+                        standard states for --thermo: 'atm' (1 atm ideal gas, as orca uses) or a concentration in mol/L (default atm)
+    --qrrho CM-1 [CM-1 ...]
+                        quasi-RRHO cutoffs for --thermo, where 0 is the plain RRHO (default 0 100)
+    --pltvib            writes neg_freqs.sh for orca_pltvib instead of writing the negative frequency animations directly
+    --clear-cache       ignores the parse cache and rebuilds it from every .out file
+    --no-cache          neither reads nor writes the parse cache
+
+Parsed results are cached in .process_orca_4_cache.json, keyed by file name, size, modification time and PARSER_VERSION.
+On a rerun, only new or changed .out files are parsed again.
+In recursive mode, directories whose .out files are all unchanged are read from .process_orca_4_campaign.json instead.
+"""
+
+#####################
+###Version Control###
+#####################
+
+#(since I will probably not convince the Carrow lab to use Github)
+#Update this value whenever edits are made and add to the Edit History comment.
+
+edit_history = """
+Version Initials    Date            Summary
+1.0     ARS         25-Jun-2023     First draft of entire codebase is written
+1.1     ARS         26-Jun-2023     Extensive formatting and coding condensed
+1.2     ARS         26-Jun-2023     Incorporated ChatGPT recommendations
+2.0     ARS         26-Jun-2023     Now creates a .sh file for visualizing negative frequencies
+2.1     ARS         29-Jun-2023     added case sensitivity as an option to the find_in function, minor debugging, cost is now properly in cpu*h instead of h
+2.2     ARS         21-Jul-2023     neg_freq shell file now prevents very large jobs (excessive negative frequencies) from being run on the head node.
+2.3     ARS         17-Oct-2026     .out files are parsed in a single streaming pass instead of readlines(). Termination and timing are read from the end of the file.
+2.4     ARS         17-Oct-2026     added optional parallel parsing (-j N). Rows are sorted by molecule name and unreadable files are skipped instead of crashing the run.
+2.5     ARS         17-Oct-2026     added a per-directory parse cache so that only new or changed .out files are parsed on a rerun.
+2.6     ARS         17-Oct-2026     added recursive mode (-r) which aggregates every directory under the working directory into one campaign summary.
+2.7     ARS         17-Oct-2026     added an optional SQLite results store (--sqlite DB).
+2.8     ARS         17-Oct-2026     .out files with $new_job are no longer skipped. Each job gets its own row with its share of the cost.
+2.9     ARS         17-Oct-2026     added --fit-model, which fits the launch_orca_4 resource model to finished jobs. %maxcore and atom counts are now parsed.
+2.10    ARS         17-Oct-2026     added --watch, which follows the running jobs by reading only what has been appended to each .out file.
+2.11    ARS         17-Oct-2026     parses the module timings, SCF iterations and optimization cycles of each job into {job_name}_timings.csv, with a cost rollup per command line in {job_name}_cost_by_settings.csv.
+2.12    ARS         17-Oct-2026     the negative frequency animations are written directly from the .hess files with numpy instead of running orca_pltvib from neg_freqs.sh.
+2.13    ARS         17-Oct-2026     parses the charge, spin, last geometry and every frequency of each job, which --npz writes to a memory-mappable {job_name}_geometries.npz.
+2.14    ARS         17-Oct-2026     --result-cache adds the normally terminated jobs to the lab's result cache, which launch_orca_4 cache reuses.
+2.15    ARS         17-Oct-2026     --archive compresses finished outputs and job_files with gzip or lzma. Archived .out and .hess files are read by streaming decompression.
+2.16    ARS         17-Oct-2026     parses the temperature, mass, symmetry number and rotational constants of freq jobs. --thermo recomputes H and G over a grid of temperatures, standard states and quasi-RRHO cutoffs.
+2.17    ARS         17-Oct-2026     --sqlite deletes the rows of outputs which have been removed or renamed, so the summary view matches the .csv.
+2.18    ARS         17-Oct-2026     optTS jobs are labelled optTS instead of opt, since 'optts' also contains 'opt'. launch_orca_4 restart picks repair_TS from this label.
+2.19    ARS         17-Oct-2026     parses the peak memory orca reports. --fit-model fits the memory to it where available and replaces the model file atomically.
+2.20    ARS         17-Oct-2026     publish_results also copies .gbw and .hess files archived with lzma (.xz)
+2.21    ARS         17-Oct-2026     --archive leaves the outputs whose optimization did not converge (or whose chained jobs did not all finish) alone
+2.22    ARS         17-Oct-2026     --thermo no longer takes the log of a zero rotational partition function for atoms
+2.23    ARS         17-Oct-2026     job_hash and the resource model features are imported from orca_jobs_v1_0.py instead of launch_orca_4
+2.24    ARS         17-Oct-2026     -r no longer caches directories with a file that could not be parsed, so the file is retried on the next run
+2.25    ARS         17-Oct-2026     documented that parse_out_file takes the termination and run time from the last two lines it streams, not from read_tail
+"""
+
+#Increment this whenever parse_out_file changes what it returns. Cached results from other versions are discarded.
+PARSER_VERSION = 10
+CACHE_FILE = '.process_orca_4_cache.json'
+CAMPAIGN_CACHE_FILE = '.process_orca_4_campaign.json'
+BOHR_TO_ANGSTROM = 0.529177210903
+#the memory model predicts this multiple of the peak memory orca used, since the prediction becomes %maxcore
+PEAK_MEMORY_HEADROOM = 1.25
+#each animation is one period of the vibration, with the largest atomic displacement in angstroms
+ANIMATION_FRAMES = 20
+ANIMATION_AMPLITUDE = 0.5
+
+#TODO: handle jobs that ran out of iterations (currently crashes)
+#TODO: make sure to save files as out_file_n+1 in case out_file already exists
+
+import os
+import csv
+import gzip
+import lzma
+import json
+import sqlite3
+import time
+import shutil
+import argparse
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+#archived files are compressed with one of these codecs and keep their name with the codec's extension added
+ARCHIVE_CODECS = {'gzip': ('.gz', gzip), 'lzma': ('.xz', lzma)}
+
+def strip_compression(filename):
+    """returns a filename without the extension of an archive codec (e.g. x.out.gz -> x.out)"""
+    for extension, codec in ARCHIVE_CODECS.values():
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+def open_output(filename, mode='r'):
+    """opens an orca output for reading, decompressing it on the fly if it was archived (.gz or .xz)"""
+    for extension, codec in ARCHIVE_CODECS.values():
+        if filename.endswith(extension):
+            return codec.open(filename, 'rt' if mode == 'r' else mode)
+    return open(filename, mode)
+
+def read_tail(filename, n_lines=2, block_size=4096):
+    """
+    Returns the last n_lines of a file (stripped of leading and trailing spaces).
+    Seeks backwards from the end of the file in blocks, so only the tail is ever read.
+    This is for files whose rows come from the parse cache and are not streamed again (publish_results, archive_files);
+    parse_out_file keeps the last lines of the stream it reads anyway.
+    A compressed file cannot be read backwards, so it is streamed through once instead.
+    """
+    if strip_compression(filename) != filename:
+        with open_output(filename) as file:
+            return [line.strip() for line in deque(file, maxlen=n_lines)]
+
+    with open(filename, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        tail = b''
+        while position > 0 and tail.count(b'\n') <= n_lines:
+            step = min(block_size, position)
+            position -= step
+            file.seek(position)
+            tail = file.read(step) + tail
+
+    lines = tail.decode(errors='replace').splitlines()
+    return [line.strip() for line in lines[-n_lines:]]
+
+def find_in(lines, starts_with, direction='', case=True):
+    """
+    Finds the first line in a set of lines (lines) that starts with a specified string (starts_with).
+    By default, it searches in the forward direction, but setting direction='reverse' reverses the behavior.
+    Returns None if the string is not found.
+    """
+    if case:
+        if direction == '':
+            for line in lines:
+                if line.startswith(starts_with):
+                    return line
+        elif direction == 'reverse':
+            for line in reversed(lines):
+                if line.startswith(starts_with):
+                    return line
+    else:
+        if direction == '':
+            for line in lines:
+                if line.lower().startswith(starts_with.lower()):
+                    return line
+        elif direction == 'reverse':
+            for line in reversed(lines):
+                if line.lower().startswith(starts_with.lower()):
+                    return line
+
+def new_subjob():
+    """returns the results of one job of an .out file before any of them are found"""
+    return {'E': None, 'H': None, 'G': None, 'frequencies': [], 'converged': False, 'time': None, 'elements': None,
+            'geometry': None, 'cycles': 0, 'scf iterations': 0, 'timings': {},
+            'temperature': None, 'mass': None, 'symmetry number': None, 'rotational constants': None, 'peak memory': None}
+
+def parse_out_file(filename):
+    """
+    Parses a single orca .out file in one pass and returns (rows, neg_freq_info, details) for the results table.
+    details holds one dictionary per row with the ncores, %maxcore, element counts and peak memory per process (MB, the largest
+    'Maximum memory used' that orca reports, or None) of that job, which are not part of the table but are needed to fit the resource model,
+    its optimization cycles, SCF iterations and the seconds spent in each module, for the timing tables,
+    its charge, spin, last geometry ([element, x, y, z] rows) and every frequency, for the geometry store,
+    and the temperature, total mass (amu), symmetry number and rotational constants (cm^-1) of its thermochemistry, for thermochemistry().
+    The file is streamed line by line through a small state machine ('header', 'input', 'results', 'freq', 'coords', 'timings'),
+    so only the echoed input and the most recent energy lines are held in memory.
+    The termination and TOTAL RUN TIME lines are taken from the last two lines of that stream (kept in a 2-line deque),
+    so the file is not opened again or read backwards as read_tail does.
+    Archived (.out.gz or .out.xz) files are decompressed as they are streamed.
+
+    Files with $new_job contain several jobs, which ORCA separates with a 'JOB NUMBER' banner.
+    Each of them gets its own row, named {molecule_name}_job{n}, with the commands from its part of the input.
+    Its cost is the total run time split in proportion to the 'Sum of individual times' of each job.
+    """
+    molecule_name = os.path.basename(filename).split('.')[0]
+    inputs = []
+    subjobs = [new_subjob()]
+
+    state = 'header'
+    previous = None
+    count_elements = False
+    tail = deque(maxlen=2)
+    with open_output(filename) as file:
+        for line in file:
+            line = line.strip()
+            tail.append(line)
+
+            #each line is handled one step late so the last line of a truncated file is ignored
+            line, previous = previous, line
+            if line is None:
+                continue
+
+            #the module timings are listed as 'module   ...   seconds sec (= minutes min)  percent %'
+            if state == 'timings':
+                if '...' in line and ' sec' in line:
+                    module, timing = line.split('...', 1)
+                    if module.strip() == 'Sum of individual times':
+                        subjobs[-1]['time'] = float(timing.split()[0])
+                    else:
+                        subjobs[-1]['timings'][module.strip()] = float(timing.split()[0])
+                    continue
+                elif line == '':
+                    continue
+                state = 'results'
+
+            #the input block is echoed between 'INPUT FILE' and '****END OF INPUT****'
+            if line.endswith('****END OF INPUT****'):
+                state = 'results'
+            elif line.endswith('INPUT FILE'):
+                inputs = []
+                state = 'input'
+            elif state == 'input':
+                #removes the '|  #>'
+                if line.startswith('|'):
+                    inputs.append(line[line.index('>') + 2:])
+
+            #only the last occurrence of each energy is kept
+            elif state == 'results':
+                subjob = subjobs[-1]
+                if line.startswith('FINAL SINGLE POINT ENERGY'):
+                    subjob['E'] = line.split()[-1]
+                elif line.startswith('Total enthalpy'):
+                    subjob['H'] = line.split()[-2]
+                elif line.startswith('Final Gibbs free energy'):
+                    subjob['G'] = line.split()[-2]
+                elif '***        THE OPTIMIZATION HAS CONVERGED     ***' in line:
+                    subjob['converged'] = True
+                elif 'Writing the Hessian file to the disk' in line:
+                    subjob['frequencies'] = []
+                    state = 'freq'
+                elif line.startswith('Timings for individual modules'):
+                    state = 'timings'
+                elif line.startswith('Sum of individual times'):
+                    subjob['time'] = float(line.split()[5])
+                elif 'GEOMETRY OPTIMIZATION CYCLE' in line:
+                    parts = line.split()
+                    subjob['cycles'] = int(parts[parts.index('CYCLE') + 1])
+                elif 'SCF CONVERGED AFTER' in line:
+                    parts = line.split()
+                    subjob['scf iterations'] += int(parts[parts.index('AFTER') + 1])
+                elif line.startswith('$') and 'JOB NUMBER' in line:
+                    subjobs.append(new_subjob())
+                #e.g. 'Maximum memory used throughout the entire SCF-calculation: 224.1 MB', once per module
+                elif line.startswith('Maximum memory used throughout the entire'):
+                    memory = float(line.split(':')[1].split()[0])
+                    subjob['peak memory'] = max(subjob['peak memory'] or 0, memory)
+                #the thermochemistry section gives the temperature, mass, symmetry number and rotational constants used for H and G
+                elif line.startswith('Temperature') and '...' in line:
+                    subjob['temperature'] = float(line.split('...')[1].split()[0])
+                elif line.startswith('Total Mass') and '...' in line:
+                    subjob['mass'] = float(line.split('...')[1].split()[0])
+                elif line.startswith('Point Group:') and 'Symmetry Number:' in line:
+                    subjob['symmetry number'] = int(line.split('Symmetry Number:')[1].split()[0])
+                elif line.startswith('Rotational constants in cm-1:'):
+                    subjob['rotational constants'] = [float(value) for value in line.split(':')[1].split()]
+                elif line == 'CARTESIAN COORDINATES (ANGSTROEM)':
+                    #the atoms are counted from the first geometry of each job
+                    count_elements = subjob['elements'] is None
+                    if count_elements:
+                        subjob['elements'] = {}
+                    subjob['geometry'] = []
+                    state = 'coords'
+
+            #only the last geometry of each job is kept
+            elif state == 'coords':
+                parts = line.split()
+                if len(parts) == 4:
+                    subjobs[-1]['geometry'].append([parts[0]] + [float(x) for x in parts[1:]])
+                    if count_elements:
+                        subjobs[-1]['elements'][parts[0]] = subjobs[-1]['elements'].get(parts[0], 0) + 1
+                elif not line.startswith('---'):
+                    state = 'results'
+
+            #frequencies are listed as '#:   frequency cm**-1' before the normal modes
+            elif state == 'freq':
+                if 'NORMAL MODES' in line:
+                    state = 'results'
+                else:
+                    parts = line.split()
+                    if len(parts) >= 3 and parts[0].endswith(':') and parts[2] == 'cm**-1':
+                        subjobs[-1]['frequencies'].append([parts[0][:-1], float(parts[1])])
+
+    #splits the input into the part belonging to each job
+    job_inputs = [[]]
+    for line in inputs:
+        if line.lower().startswith('$new_job'):
+            job_inputs.append([])
+        else:
+            job_inputs[-1].append(line)
+
+    #determines if job finished correctly from the last two lines of the stream
+    if len(tail) == 2 and tail[0] == '****ORCA TERMINATED NORMALLY****':
+        timing = tail[1].split()
+        wall_time = 24*float(timing[3]) + float(timing[5]) + float(timing[7])/60 + float(timing[9])/3600
+    else:
+        wall_time = None
+
+    rows = []
+    neg_freq_info = []
+    details = []
+    ncores = None
+    maxcore = None
+    charge, spin = None, None
+    for n, (job_input, subjob) in enumerate(zip(job_inputs, subjobs), start=1):
+        #finds commands, ncores, maxcore (later jobs keep the previous %pal and %maxcore if they do not set their own)
+        commands = find_in(job_input, '!').lower()
+        pal = find_in(job_input, '%pal nprocs', case=False)
+        if pal is not None:
+            ncores = pal.split()[2]
+        maxcore_line = find_in(job_input, '%maxcore', case=False)
+        if maxcore_line is not None:
+            maxcore = int(maxcore_line.split()[1])
+        #the coordinates line is '* xyz charge spin' or '* xyzfile charge spin filename'
+        coordinates_line = find_in(job_input, '*')
+        try:
+            charge, spin = (int(value) for value in coordinates_line.split()[2:4])
+        except (AttributeError, ValueError):
+            pass
+
+        if len(job_inputs) == 1:
+            name = molecule_name
+            cost = 'N/A' if wall_time is None else int(ncores) * wall_time
+        else:
+            name = f'{molecule_name}_job{n}'
+            times = [other['time'] or 0 for other in subjobs]
+            if subjob['time'] is None:
+                cost = 'N/A'
+            elif wall_time is not None and sum(times) > 0:
+                cost = int(ncores) * wall_time * subjob['time'] / sum(times)
+            else:
+                cost = int(ncores) * subjob['time'] / 3600
+
+        #finds job_type (optts is checked first since it also contains 'opt')
+        if 'optts' in commands:
+            job_type = 'optTS'
+        elif 'opt' in commands:
+            job_type = 'opt'
+        else:
+            job_type = 'SP'
+
+        #finds H, G, and neg_freqs if freq == True
+        #every job writes to the same .hess file, so only the last freq job can be visualized
+        freq = ('freq' in commands)
+        E, H, G = subjob['E'], subjob['H'], subjob['G']
+        if freq:
+            neg_freqs = []
+            neg_freq_info = []
+            for mode, frequency in subjob['frequencies']:
+                if frequency < 0:
+                    neg_freqs.append(frequency)
+                    neg_freq_info.append([molecule_name, mode])
+        else:
+            H, G, neg_freqs = '', '', ''
+
+        #finds geom_converged if calculation is a type of optimization
+        if job_type == 'opt' or job_type == 'optTS':
+            geom_converged = subjob['converged']
+        else:
+            geom_converged = ''
+
+        rows.append([name, commands, job_type, freq, cost, E, H, G, neg_freqs, geom_converged])
+        details.append({'ncores': int(ncores), 'maxcore': maxcore, 'elements': subjob['elements'],
+                        'cycles': subjob['cycles'], 'scf iterations': subjob['scf iterations'], 'timings': subjob['timings'],
+                        'charge': charge, 'spin': spin, 'geometry': subjob['geometry'],
+                        'frequencies': [frequency for mode, frequency in subjob['frequencies']] if freq else [],
+                        'temperature': subjob['temperature'], 'mass': subjob['mass'],
+                        'symmetry number': subjob['symmetry number'], 'rotational constants': subjob['rotational constants'],
+                        'peak memory': subjob['peak memory']})
+
+    return rows, neg_freq_info, details
+
+def safe_parse(filename):
+    """
+    Wraps parse_out_file so that one corrupt or truncated file does not take down the whole run.
+    Returns (filename, parsed, error), where error is None if the file was parsed.
+    """
+    try:
+        return filename, parse_out_file(filename), None
+    except Exception as error:
+        return filename, None, f'{type(error).__name__}: {error}'
+
+def parse_all(filenames, workers=1):
+    """
+    Parses every file in filenames, either serially or over a process pool of the given number of workers.
+    Results are returned in the same order as filenames.
+    """
+    if workers == 0:
+        workers = os.cpu_count()
+    if workers == 1 or len(filenames) < 2:
+        return [safe_parse(filename) for filename in filenames]
+
+    #several files per task keeps the pickling overhead low for large directories
+    chunksize = max(1, len(filenames) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(safe_parse, filenames, chunksize=chunksize))
+
+def file_signature(path):
+    """returns the [size, mtime] pair used to decide whether a cached result is still valid"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def load_cache(directory='.', cache_file=CACHE_FILE):
+    """
+    Loads a cache file from a directory as a dictionary of entries.
+    Returns an empty cache if there is none, it cannot be read, or it was written by another PARSER_VERSION.
+    """
+    try:
+        with open(os.path.join(directory, cache_file), 'r') as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    if cache.get('parser version') != PARSER_VERSION:
+        return {}
+    return cache.get('entries', {})
+
+def save_cache(entries, directory='.', cache_file=CACHE_FILE):
+    """Writes a cache file to a directory. The file is replaced atomically so an interrupted run cannot corrupt it."""
+    cache_path = os.path.join(directory, cache_file)
+    try:
+        with open(f'{cache_path}.tmp', 'w') as file:
+            json.dump({'parser version': PARSER_VERSION, 'entries': entries}, file)
+        os.replace(f'{cache_path}.tmp', cache_path)
+    except OSError as error:
+        print(f'Warning: could not write {cache_path} ({error})')
+
+def list_out_files(directory='.'):
+    """
+    Lists the orca .out files of a directory, skipping slurm .out files.
+    Archived .out files (.out.gz or .out.xz) are listed too, unless the uncompressed file is also there.
+    Sorted by molecule name so that the table and neg_freqs.sh are in the same order on every run.
+    """
+    names = [entry.name for entry in os.scandir(directory)]
+    orca_outs = [name for name in names if is_out_file(name) and (name.endswith('.out') or strip_compression(name) not in names)]
+    orca_outs.sort(key=lambda filename: filename.split('.')[0])
+    return orca_outs
+
+def is_out_file(filename):
+    """returns True for an orca .out file, archived or not, and False for slurm .out files"""
+    return strip_compression(filename).endswith('.out') and 'slurm' not in filename
+
+def parse_directories(directories, workers=1, use_cache=True, clear_cache=False):
+    """
+    Parses every .out file in each of the directories with a single pool of workers.
+    Returns {directory: [(filename, parsed, error)]}, with each list sorted by molecule name.
+    Files whose size and modification time match the directory's cache are not read again.
+    Only successfully parsed files are cached; unreadable files are retried on every run.
+    """
+    plans = {}
+    stale_paths = []
+    for directory in directories:
+        orca_outs = list_out_files(directory)
+
+        cache = {}
+        if use_cache and not clear_cache:
+            cache = load_cache(directory)
+
+        paths = {filename: os.path.normpath(os.path.join(directory, filename)) for filename in orca_outs}
+        signatures = {filename: file_signature(paths[filename]) for filename in orca_outs}
+        for filename in orca_outs:
+            if filename not in cache or cache[filename]['signature'] != signatures[filename]:
+                stale_paths.append(paths[filename])
+
+        plans[directory] = (orca_outs, paths, signatures, cache)
+
+    parsed_paths = {path: (parsed, error) for path, parsed, error in parse_all(stale_paths, workers)}
+
+    results = {}
+    for directory, (orca_outs, paths, signatures, cache) in plans.items():
+        entries = []
+        new_cache = {}
+        for filename in orca_outs:
+            if paths[filename] in parsed_paths:
+                parsed, error = parsed_paths[paths[filename]]
+            else:
+                parsed, error = cache[filename]['parsed'], None
+            if parsed is not None:
+                new_cache[filename] = {'signature': signatures[filename], 'parsed': parsed}
+            entries.append((filename, parsed, error))
+
+        if use_cache:
+            save_cache(new_cache, directory)
+        results[directory] = entries
+
+    return results
+
+def parse_directory(directory='.', workers=1, use_cache=True, clear_cache=False):
+    """Parses every .out file in one directory. See parse_directories."""
+    return parse_directories([directory], workers, use_cache, clear_cache)[directory]
+
+def find_out_directories(root='.'):
+    """Walks a directory tree and returns every directory that contains orca .out files, in sorted order. Hidden directories are skipped."""
+    directories = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories[:] = sorted(subdirectory for subdirectory in subdirectories if not subdirectory.startswith('.'))
+        if any(is_out_file(filename) for filename in filenames):
+            directories.append(os.path.normpath(directory))
+    return directories
+
+def directory_signature(directory):
+    """returns [filename, size, mtime] for every .out file in a directory"""
+    return [[filename] + file_signature(os.path.join(directory, filename)) for filename in list_out_files(directory)]
+
+def new_watch_status():
+    """returns the progress of one .out file before any of it has been read"""
+    return {'offset': 0, 'partial': '', 'job': 1, 'state': 'running', 'cycle': None, 'energy': None,
+            'max gradient': None, 'scf time': 0.0, 'run time': None}
+
+def update_watch_status(filename, status):
+    """
+    Reads the bytes appended to an .out file since the last call and updates its progress in place.
+    status['offset'] remembers how far the file has been read, and an incomplete last line is kept in status['partial']
+    until the rest of it is written. A file that has shrunk (e.g. it was replaced) is read again from the start.
+    """
+    size = os.path.getsize(filename)
+    if size < status['offset']:
+        status.clear()
+        status.update(new_watch_status())
+    if size == status['offset']:
+        return status
+
+    with open(filename, 'rb') as file:
+        file.seek(status['offset'])
+        data = file.read(size - status['offset'])
+    status['offset'] += len(data)
+
+    lines = (status['partial'] + data.decode(errors='replace')).split('\n')
+    status['partial'] = lines.pop()
+    for line in lines:
+        line = line.strip()
+        if 'GEOMETRY OPTIMIZATION CYCLE' in line:
+            parts = line.split()
+            status['cycle'] = int(parts[parts.index('CYCLE') + 1])
+        elif line.startswith('FINAL SINGLE POINT ENERGY'):
+            status['energy'] = float(line.split()[-1])
+        elif line.startswith('Total Energy') and ':' in line:
+            status['energy'] = float(line.split(':')[1].split()[0])
+        elif line.startswith('MAX gradient'):
+            status['max gradient'] = float(line.split()[2])
+        elif line.startswith('Total SCF time:'):
+            timing = line.split()
+            status['scf time'] += 24*float(timing[3]) + float(timing[5]) + float(timing[7])/60 + float(timing[9])/3600
+        elif line.startswith('$') and 'JOB NUMBER' in line:
+            status['job'] += 1
+            status['cycle'] = None
+            status['max gradient'] = None
+        elif line == '****ORCA TERMINATED NORMALLY****':
+            status['state'] = 'finished'
+        elif 'error termination' in line.lower() or 'aborting the run' in line.lower():
+            status['state'] = 'error'
+        elif line.startswith('TOTAL RUN TIME'):
+            timing = line.split()
+            status['run time'] = 24*float(timing[3]) + float(timing[5]) + float(timing[7])/60 + float(timing[9])/3600
+
+    return status
+
+def watch_table(statuses, now):
+    """formats the progress of each .out file as a table, one line per file"""
+    header = f'{"molecule name":30} {"job":>3} {"state":8} {"cycle":>5} {"E (a.u.)":>16} {"max grad":>9} {"time (h)":>8} {"idle (min)":>10}'
+    lines = [header, '-' * len(header)]
+    for filename, status in statuses.items():
+        cycle = '' if status['cycle'] is None else status['cycle']
+        energy = '' if status['energy'] is None else f'{status["energy"]:.8f}'
+        gradient = '' if status['max gradient'] is None else f'{status["max gradient"]:.6f}'
+        #the run time is only printed when orca finishes, until then the SCF time is the best estimate
+        hours = status['run time'] if status['run time'] is not None else status['scf time']
+        idle = (now - status.get('mtime', now)) / 60
+        lines.append(f'{filename.split(".")[0]:30} {status["job"]:>3} {status["state"]:8} {cycle:>5} {energy:>16} '
+                     f'{gradient:>9} {hours:>8.2f} {idle:>10.1f}')
+    return '\n'.join(lines)
+
+def watch_out_files(interval=60):
+    """
+    Prints the progress of every .out file in the working directory (optimization cycle, last energy, max gradient,
+    time and minutes since the file was last written) every interval seconds until interrupted.
+    Files that have not grown since the last refresh are not opened again, so hundreds of jobs can be followed cheaply.
+    An interval of 0 prints the table once.
+    """
+    statuses = {}
+    try:
+        while True:
+            #archived files are finished, so there is nothing to follow in them
+            for filename in [filename for filename in list_out_files('.') if filename.endswith('.out')]:
+                status = statuses.setdefault(filename, new_watch_status())
+                try:
+                    update_watch_status(filename, status)
+                    status['mtime'] = os.path.getmtime(filename)
+                except (OSError, ValueError, IndexError) as error:
+                    print(f'Warning: could not read {filename} ({error})')
+            now = time.time()
+            running = sum(status['state'] == 'running' for status in statuses.values())
+            print(f'\n{time.strftime("%H:%M:%S")}  {job_name}: {running} of {len(statuses)} jobs running')
+            print(watch_table(statuses, now))
+            if interval == 0:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+RESULTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    source_directory TEXT NOT NULL,
+    molecule_name TEXT NOT NULL,
+    command_line TEXT,
+    job_type TEXT,
+    freq INTEGER,
+    cost REAL,
+    E REAL,
+    H REAL,
+    G REAL,
+    neg_freqs TEXT,
+    n_neg_freqs INTEGER,
+    geom_converged INTEGER,
+    PRIMARY KEY (source_directory, molecule_name)
+);
+CREATE INDEX IF NOT EXISTS results_molecule_name ON results (molecule_name);
+CREATE INDEX IF NOT EXISTS results_job_type ON results (job_type);
+CREATE INDEX IF NOT EXISTS results_command_line ON results (command_line);
+CREATE VIEW IF NOT EXISTS summary AS
+    SELECT source_directory AS "source directory", molecule_name AS "molecule name", command_line AS "command line",
+           job_type AS "job type", freq AS "freq?", cost AS "cost (cpu*hr)", E AS "E (a.u.)", H AS "H (a.u.)",
+           G AS "G (a.u.)", neg_freqs AS "neg freq (cm^-1)", geom_converged AS "geom converged?"
+    FROM results ORDER BY source_directory, molecule_name;
+"""
+
+def to_number(value):
+    """converts a table entry to a float for the database, with None for missing values such as '' or 'N/A'"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def store_results(db_path, source_rows, directories):
+    """
+    Upserts rows into the results table of an SQLite database, creating the table, indexes and summary view if needed.
+    source_rows is a list of (source_directory, row), where row follows the summary table header.
+    Each output is keyed by its source directory and molecule name, so rerunning replaces the old row.
+    directories lists every directory that was summarized. Their rows which are not in source_rows (outputs that have
+    been removed, renamed or can no longer be read) are deleted, so the table matches the summary .csv of each directory.
+    """
+    records = []
+    for source_directory, row in source_rows:
+        molecule_name, commands, job_type, freq, cost, E, H, G, neg_freqs, geom_converged = row
+        if isinstance(neg_freqs, list):
+            n_neg_freqs = len(neg_freqs)
+            neg_freqs = json.dumps(neg_freqs)
+        else:
+            n_neg_freqs, neg_freqs = None, None
+        if geom_converged == '':
+            geom_converged = None
+        records.append((os.path.abspath(source_directory), molecule_name, commands, job_type, int(freq),
+                        to_number(cost), to_number(E), to_number(H), to_number(G),
+                        neg_freqs, n_neg_freqs, geom_converged))
+
+    #the timeout lets several process_orca_4 runs share one database
+    connection = sqlite3.connect(db_path, timeout=60)
+    try:
+        with connection:
+            connection.executescript(RESULTS_SCHEMA)
+            connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', records)
+            connection.execute('CREATE TEMP TABLE current (source_directory TEXT, molecule_name TEXT)')
+            connection.executemany('INSERT INTO current VALUES (?, ?)', [record[:2] for record in records])
+            stale = 0
+            for directory in directories:
+                stale += connection.execute("""
+                    DELETE FROM results WHERE source_directory = ? AND NOT EXISTS (
+                        SELECT 1 FROM current WHERE current.source_directory = results.source_directory
+                                                AND current.molecule_name = results.molecule_name)""",
+                    (os.path.abspath(directory),)).rowcount
+    finally:
+        connection.close()
+    print(f'{len(records)} results stored in {db_path} ({stale} stale rows removed)')
+
+def write_geometry_store(path, entries):
+    """
+    Writes the final geometry, charge, spin and frequencies of every job to a columnar .npz archive at path.
+    entries is a list of (row, details) from parse_out_file. Jobs without coordinates are left out.
+    Every column is a flat array, with an offset index giving the rows of each molecule:
+        names                       molecule names (as in the summary), in the order of the summary
+        charges, spins              one value per molecule (-1 if unknown)
+        atom_offsets                the atoms of molecule i are elements[atom_offsets[i]:atom_offsets[i+1]]
+        elements, coordinates       element symbols and coordinates (angstroms, shape (atoms, 3)) of every molecule in turn
+        frequency_offsets           the frequencies of molecule i are frequencies[frequency_offsets[i]:frequency_offsets[i+1]]
+        frequencies                 every frequency (cm^-1) of the last freq calculation of each job, including the zero modes
+    The archive is not compressed so that load_geometry_store can memory-map it, and it is replaced atomically.
+    """
+    import numpy as np
+
+    entries = [(row, details) for row, details in entries if details.get('geometry')]
+    geometries = [details['geometry'] for row, details in entries]
+    frequencies = [details['frequencies'] for row, details in entries]
+    columns = {
+        'names': np.array([row[0] for row, details in entries], dtype=str),
+        'charges': np.array([-1 if details['charge'] is None else details['charge'] for row, details in entries], dtype=np.int32),
+        'spins': np.array([-1 if details['spin'] is None else details['spin'] for row, details in entries], dtype=np.int32),
+        'atom_offsets': np.cumsum([0] + [len(geometry) for geometry in geometries], dtype=np.int64),
+        'elements': np.array([atom[0] for geometry in geometries for atom in geometry], dtype='<U2'),
+        'coordinates': np.array([atom[1:] for geometry in geometries for atom in geometry], dtype=np.float64).reshape(-1, 3),
+        'frequency_offsets': np.cumsum([0] + [len(frequency_list) for frequency_list in frequencies], dtype=np.int64),
+        'frequencies': np.array([frequency for frequency_list in frequencies for frequency in frequency_list], dtype=np.float64)}
+
+    with open(f'{path}.tmp', 'wb') as file:
+        np.savez(file, **columns)
+    os.replace(f'{path}.tmp', path)
+    print(f'Geometry store {path} created with {len(entries)} geometries.')
+
+def load_geometry_store(path, mmap=True):
+    """
+    Loads a geometry store written by write_geometry_store as a dictionary of its columns,
+    plus 'index', a dictionary from molecule name to its position in the columns.
+    With mmap=True, every column is memory-mapped straight from the archive (its members are stored uncompressed),
+    so nothing is read until it is sliced. numpy is only imported here, so the rest of this script runs without it.
+    e.g.
+        store = load_geometry_store('batch_geometries.npz')
+        elements, coordinates, charge, spin, frequencies = geometry_store_entry(store, 'PPh3_0_1')
+    """
+    import zipfile
+    import struct
+    import numpy as np
+
+    if not mmap:
+        with np.load(path) as archive:
+            store = {member: archive[member] for member in archive.files}
+    else:
+        store = {}
+        with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+            for info in archive.infolist():
+                if info.compress_type != zipfile.ZIP_STORED:
+                    raise ValueError(f'{info.filename} is compressed and cannot be memory-mapped')
+                #the data follows the 30 byte local header, the member name and its extra field
+                file.seek(info.header_offset + 26)
+                name_length, extra_length = struct.unpack('<HH', file.read(4))
+                file.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(file)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+                column = info.filename[:-len('.npy')]
+                if 0 in shape:
+                    store[column] = np.zeros(shape, dtype=dtype)
+                else:
+                    store[column] = np.memmap(path, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                              order='F' if fortran_order else 'C')
+
+    store['index'] = {str(name): n for n, name in enumerate(store['names'])}
+    return store
+
+def geometry_store_entry(store, molecule_name):
+    """
+    Returns (elements, coordinates, charge, spin, frequencies) of one molecule of a loaded geometry store.
+    The arrays are slices of the store, so nothing is copied.
+    """
+    n = store['index'][molecule_name]
+    atoms = slice(store['atom_offsets'][n], store['atom_offsets'][n + 1])
+    frequencies = slice(store['frequency_offsets'][n], store['frequency_offsets'][n + 1])
+    return (store['elements'][atoms], store['coordinates'][atoms], int(store['charges'][n]), int(store['spins'][n]),
+            store['frequencies'][frequencies])
+
+def out_file_job(filename):
+    """
+    Reads what an .out file was asked to calculate: the settings of each job (as echoed in the input block), the charge and spin
+    of the first job and the geometry it started from (the first coordinates orca prints).
+    Returns (settings_chain, charge, spin, elements, coordinates), or None if any of them cannot be found.
+    Only the top of the file is read.
+    """
+    settings_chain = [[]]
+    charge, spin = None, None
+    elements, coordinates = [], []
+    state = 'header'
+    with open_output(filename) as file:
+        for line in file:
+            line = line.strip()
+            if line.endswith('****END OF INPUT****'):
+                state = 'results'
+            elif line.endswith('INPUT FILE'):
+                state = 'input'
+            elif state == 'input' and line.startswith('|'):
+                line = line[line.index('>') + 2:]
+                if line.lower().startswith('$new_job'):
+                    settings_chain.append([])
+                else:
+                    settings_chain[-1].append(line)
+                    if line.startswith('*') and charge is None and len(line.split()) >= 4:
+                        charge, spin = int(line.split()[2]), int(line.split()[3])
+            elif state == 'results' and line == 'CARTESIAN COORDINATES (ANGSTROEM)':
+                state = 'coords'
+            elif state == 'coords':
+                parts = line.split()
+                if len(parts) == 4:
+                    elements.append(parts[0])
+                    coordinates.append([float(x) for x in parts[1:]])
+                elif not line.startswith('---'):
+                    break
+    if charge is None or not elements:
+        return None
+    return settings_chain, charge, spin, elements, coordinates
+
+def publish_results(cache_path, parsed_files):
+    """
+    Adds the normally terminated jobs to the lab's result cache, which launch_orca_4 cache looks up before running a job.
+    parsed_files is a list of (directory, filename, rows). Jobs with an unconverged optimization are left out.
+    Each job is stored under the hash of its settings, charge, spin and starting geometry (job_hash from orca_jobs_v1_0.py)
+    in {cache_path}/{hash[:2]}/{hash}/, with its .out, .gbw and .hess files (or their .gz or .xz) and an entry.json describing it.
+    An entry is assembled in a temporary directory next to it and renamed into place, which is atomic, so other runs never see
+    a partial entry. If two runs publish the same job at once, one rename fails and that copy is discarded.
+    """
+    from orca_jobs_v1_0 import job_hash, hash_settings_lines, result_cache_entry
+
+    published, existing = 0, 0
+    for directory, filename, rows in parsed_files:
+        path = os.path.join(directory, filename)
+        if any(row[4] == 'N/A' or row[9] is False for row in rows):
+            continue
+        tail = read_tail(path)
+        if len(tail) != 2 or tail[0] != '****ORCA TERMINATED NORMALLY****':
+            continue
+        job = out_file_job(path)
+        if job is None:
+            continue
+        settings_chain, charge, spin, elements, coordinates = job
+        key = job_hash(settings_chain, charge, spin, elements, coordinates)
+        entry = result_cache_entry(cache_path, key)
+        if os.path.isdir(entry):
+            existing += 1
+            continue
+
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temporary = tempfile.mkdtemp(prefix=f'.{key}.', dir=os.path.dirname(entry))
+        try:
+            molecule_name = filename.split('.')[0]
+            files = {f'result{filename[filename.index("."):]}': path}
+            for extension in ('.gbw', '.hess'):
+                for candidate in [extension] + [f'{extension}{archive}' for archive, codec in ARCHIVE_CODECS.values()]:
+                    found = [os.path.join(directory, subdirectory, f'{molecule_name}{candidate}') for subdirectory in ('', 'job_files')]
+                    found = [other for other in found if os.path.exists(other)]
+                    if found:
+                        files[f'result{candidate}'] = found[0]
+                        break
+            for name, source in files.items():
+                shutil.copyfile(source, os.path.join(temporary, name))
+                os.chmod(os.path.join(temporary, name), 0o664)
+            with open(os.path.join(temporary, 'entry.json'), 'w') as file:
+                json.dump({'molecule name': molecule_name, 'source directory': os.path.abspath(directory),
+                           'user': os.environ.get('USER'), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                           'settings': [hash_settings_lines(settings_lines) for settings_lines in settings_chain],
+                           'charge': charge, 'spin': spin, 'files': sorted(files),
+                           'script': os.path.basename(__file__)}, file, indent=1)
+            os.chmod(temporary, 0o2775)
+            os.rename(temporary, entry)
+            published += 1
+        except OSError:
+            #another run published the same job first (or the copy failed), so this copy is discarded
+            shutil.rmtree(temporary, ignore_errors=True)
+            existing += os.path.isdir(entry)
+    print(f'{published} jobs added to the result cache {cache_path} ({existing} were already there)')
+
+def fit_resource_model(training, model_path):
+    """
+    Fits the resource model used by launch_orca_4 to finished jobs and saves it as json to model_path.
+    training is a list of (row, details) from parse_out_file. Only normally terminated jobs are used.
+    A separate model is fitted for each command line (i.e. each settings file) by linear least squares:
+        the memory per core (MB) is fitted linearly to the number of atoms in each row of the periodic table
+        log(cost in cpu*hr) is fitted linearly to the log of those counts (a power law in the atom counts)
+    The memory is fitted to the peak memory orca reports using, with PEAK_MEMORY_HEADROOM on top since launch_orca_4
+    uses the prediction as %maxcore. If too few jobs of a command line report their peak, it falls back to the %maxcore
+    the jobs were given, which is known to work but only reproduces the settings of the previous jobs.
+    Models for command lines that are not in this training set are kept from the existing file.
+    The file is written to a temporary file which then replaces it, so launch_orca_4 never reads a partial model.
+    numpy is only imported here, so the rest of this script runs without it.
+    """
+    import numpy as np
+    from orca_jobs_v1_0 import count_rows, memory_features, time_features
+
+    samples = {}
+    for row, details in training:
+        cost = row[4]
+        if cost == 'N/A' or cost <= 0 or details['maxcore'] is None or not details['elements']:
+            continue
+        n_atoms = count_rows(details['elements'])
+        peak = details.get('peak memory')
+        samples.setdefault(row[1], []).append((memory_features(n_atoms), time_features(n_atoms), details['maxcore'], cost,
+                                               None if peak is None else peak * PEAK_MEMORY_HEADROOM))
+
+    try:
+        with open(model_path, 'r') as file:
+            model = json.load(file)
+    except (OSError, ValueError):
+        model = {'settings': {}}
+
+    for commands, rows in sorted(samples.items()):
+        #at least as many samples as coefficients are needed for a determined fit
+        if len(rows) < max(len(rows[0][0]), len(rows[0][1])) + 2:
+            print(f'Only {len(rows)} finished jobs for "{commands}". Not enough to fit a resource model.')
+            continue
+
+        #the measured peak is used if enough jobs report it
+        measured = [sample for sample in rows if sample[4] is not None]
+        if len(measured) >= len(rows[0][0]) + 2:
+            memory_X = np.array([sample[0] for sample in measured], dtype=float)
+            memory_y = np.array([sample[4] for sample in measured], dtype=float)
+            memory_source = 'peak memory'
+        else:
+            memory_X = np.array([sample[0] for sample in rows], dtype=float)
+            memory_y = np.array([sample[2] for sample in rows], dtype=float)
+            memory_source = 'maxcore'
+        time_X = np.array([sample[1] for sample in rows], dtype=float)
+        time_y = np.log(np.array([sample[3] for sample in rows], dtype=float))
+
+        memory_coefficients = np.linalg.lstsq(memory_X, memory_y, rcond=None)[0]
+        time_coefficients = np.linalg.lstsq(time_X, time_y, rcond=None)[0]
+        time_error = float(np.sqrt(np.mean((time_X @ time_coefficients - time_y)**2)))
+
+        model['settings'][commands] = {'memory': memory_coefficients.tolist(), 'time': time_coefficients.tolist(),
+                                       'samples': len(rows), 'log time rms error': time_error, 'memory source': memory_source}
+        print(f'Fitted resource model for "{commands}" to {len(rows)} jobs (rms error of log cost {time_error:.2f}, '
+              f'memory from the {memory_source} of {len(memory_y)} jobs)')
+
+    #other campaigns may be reading the model, so it is replaced in one step
+    handle, temporary = tempfile.mkstemp(prefix='.resource_model.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(model_path)))
+    try:
+        with os.fdopen(handle, 'w') as file:
+            json.dump(model, file, indent=1)
+        os.chmod(temporary, 0o664)
+        os.replace(temporary, model_path)
+    except OSError:
+        os.remove(temporary)
+        raise
+    print(f'Resource model saved to {model_path}')
+
+def thermochemistry(entries, temperatures, concentrations, cutoffs):
+    """
+    Recomputes the thermochemistry of every freq job from its frequencies, mass, symmetry number and rotational constants
+    (ideal gas, rigid rotor, harmonic oscillator) at every combination of temperature (K), standard state and quasi-RRHO cutoff.
+    entries is a list of (source directory, row, details). Jobs without a thermochemistry section are left out.
+    A standard state is 'atm' (an ideal gas at 1 atm, as orca uses) or a concentration in mol/L (e.g. 1 for 1 M in solution),
+    which only changes the translational entropy.
+    A cutoff of 0 is the plain RRHO. Otherwise vibrations well below the cutoff (cm^-1) are treated as free rotors:
+    the vibrational entropy is interpolated to the free rotor entropy (Grimme, Chem. Eur. J. 2012, 18, 9955)
+    and the vibrational energy to kT/2 (Li et al., J. Phys. Chem. C 2015, 119, 1840), with weights 1/(1 + (cutoff/frequency)^4).
+    Imaginary and zero frequencies are left out.
+    All molecules and frequencies are computed at once for each temperature, as padded numpy arrays.
+    Returns a list of (source directory, row, temperature, standard state, cutoff, ZPE, H, T*S, G), energies in hartrees.
+    numpy is only imported here, so the rest of this script runs without it.
+    """
+    import numpy as np
+
+    KB = 1.380649e-23           #J/K
+    PLANCK = 6.62607015e-34     #J s
+    LIGHT = 2.99792458e10       #cm/s
+    AVOGADRO = 6.02214076e23    #1/mol
+    AMU = 1.66053906660e-27     #kg
+    HARTREE = 4.3597447222071e-18   #J
+    ATM = 101325.0              #Pa
+    FREE_ROTOR_INERTIA = 1e-44  #kg m^2, the average moment of inertia that limits the free rotor entropy
+
+    entries = [(source, row, details) for source, row, details in entries
+               if details.get('frequencies') and details.get('mass') and details.get('rotational constants') is not None
+               and to_number(row[5]) is not None]
+    if not entries:
+        return []
+
+    n_frequencies = max(len(details['frequencies']) for source, row, details in entries)
+    frequencies = np.full((len(entries), n_frequencies), np.nan)
+    for n, (source, row, details) in enumerate(entries):
+        frequencies[n, :len(details['frequencies'])] = details['frequencies']
+    real = frequencies > 0
+    frequencies = np.where(real, frequencies, 1.0)
+
+    E = np.array([to_number(row[5]) for source, row, details in entries])
+    mass = np.array([details['mass'] for source, row, details in entries]) * AMU
+    symmetry = np.array([details['symmetry number'] or 1 for source, row, details in entries], dtype=float)
+    multiplicity = np.array([details['spin'] or 1 for source, row, details in entries], dtype=float)
+    #linear molecules have one rotational constant of zero and atoms have three
+    constants = np.array([(list(details['rotational constants']) + [0, 0, 0])[:3] for source, row, details in entries])
+    rotating = constants > 1e-8
+    n_rotations = rotating.sum(axis=1)
+    rotational_temperatures = PLANCK * LIGHT * np.where(rotating, constants, 1.0) / KB
+
+    vibrational_temperatures = PLANCK * LIGHT * frequencies / KB
+    zpe = np.where(real, 0.5 * KB * vibrational_temperatures, 0).sum(axis=1)
+    cutoffs = np.asarray(cutoffs, dtype=float)
+    #weights of the harmonic oscillator for each cutoff, shape (cutoffs, molecules, frequencies). A cutoff of 0 gives weights of 1
+    weights = 1 / (1 + (cutoffs[:, None, None] / frequencies[None])**4)
+    reduced_inertia = PLANCK / (8 * np.pi**2 * LIGHT * frequencies)
+    reduced_inertia = reduced_inertia * FREE_ROTOR_INERTIA / (reduced_inertia + FREE_ROTOR_INERTIA)
+
+    results = []
+    for temperature in temperatures:
+        kT = KB * temperature
+        x = vibrational_temperatures / temperature
+        harmonic_entropy = KB * (x / np.expm1(x) - np.log(-np.expm1(-x)))
+        harmonic_energy = KB * vibrational_temperatures * (0.5 + 1 / np.expm1(x))
+        free_rotor_entropy = KB * (0.5 + np.log(np.sqrt(8 * np.pi**3 * reduced_inertia * kT / PLANCK**2)))
+        vibrational_entropy = np.where(real, weights * harmonic_entropy + (1 - weights) * free_rotor_entropy, 0).sum(axis=2)
+        vibrational_energy = np.where(real, weights * harmonic_energy + (1 - weights) * 0.5 * kT, 0).sum(axis=2)
+
+        #atoms do not rotate, so their partition function is 1 (rather than log(0) in the entropy below)
+        rotational_partition = np.select(
+            [n_rotations == 3, n_rotations > 0],
+            [np.sqrt(np.pi) / symmetry * np.sqrt(temperature**3 / rotational_temperatures.prod(axis=1)),
+             temperature / (symmetry * np.where(rotating, rotational_temperatures, np.inf).min(axis=1))], 1.0)
+        rotational_entropy = np.select([n_rotations == 3, n_rotations > 0],
+                                       [KB * (np.log(rotational_partition) + 1.5), KB * (np.log(rotational_partition) + 1)], 0)
+        rotational_energy = np.select([n_rotations == 3, n_rotations > 0], [1.5 * kT, kT], 0)
+        electronic_entropy = KB * np.log(multiplicity)
+
+        #H = E + translational, rotational and vibrational energy + kT (from PV), shape (cutoffs, molecules)
+        H = E + (1.5 * kT + rotational_energy + vibrational_energy + kT) / HARTREE
+        for concentration in concentrations:
+            #the volume available to each molecule at the standard state
+            if concentration == 'atm':
+                volume = kT / ATM
+                standard_state = '1 atm'
+            else:
+                volume = 1 / (float(concentration) * 1000 * AVOGADRO)
+                standard_state = f'{float(concentration):g} M'
+            translational_entropy = KB * (np.log((2 * np.pi * mass * kT / PLANCK**2)**1.5 * volume) + 2.5)
+            TS = temperature * (translational_entropy + rotational_entropy + vibrational_entropy + electronic_entropy) / HARTREE
+            G = H - TS
+            for c, cutoff in enumerate(cutoffs):
+                for n, (source, row, details) in enumerate(entries):
+                    results.append((source, row, temperature, standard_state, cutoff, zpe[n] / HARTREE, H[c, n], TS[c, n], G[c, n]))
+    return results
+
+def write_thermochemistry_table(file_prefix, entries, script_info, temperatures, concentrations, cutoffs):
+    """
+    Writes {file_prefix}_thermochemistry.csv with H, T*S and G of every freq job recomputed at each temperature,
+    standard state and quasi-RRHO cutoff (see thermochemistry). entries is a list of (source directory, row, details),
+    where the source directory is None outside of recursive mode.
+    """
+    results = thermochemistry(entries, temperatures, concentrations, cutoffs)
+    campaign = any(source is not None for source, row, details in entries)
+
+    header = ['molecule name', 'command line', 'T (K)', 'standard state', 'qRRHO cutoff (cm^-1)', 'E (a.u.)', 'ZPE (a.u.)',
+              'H (a.u.)', 'T*S (a.u.)', 'G (a.u.)', 'G (orca, a.u.)']
+    table = []
+    for source, row, temperature, standard_state, cutoff, zpe, H, TS, G in results:
+        table.append(([source] if campaign else []) + [row[0], row[1], temperature, standard_state, cutoff, row[5], zpe, H, TS, G, row[7]])
+    if campaign:
+        header = ['source directory'] + header
+
+    with open(f'{file_prefix}_thermochemistry.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows([script_info, header] + table)
+    print(f'Thermochemistry file {file_prefix}_thermochemistry.csv created.')
+
+def write_timing_tables(file_prefix, timing_entries, script_info):
+    """
+    Writes {file_prefix}_timings.csv, with the optimization cycles, SCF iterations and seconds spent in each module of every job,
+    and {file_prefix}_cost_by_settings.csv, which adds up the cost of each command line and splits it between the modules
+    in proportion to their share of the time. timing_entries is a list of (source directory, row, details),
+    where the source directory is None outside of recursive mode.
+    """
+    modules = []
+    for source, row, details in timing_entries:
+        modules += [module for module in details['timings'] if module not in modules]
+    campaign = any(source is not None for source, row, details in timing_entries)
+
+    timing_header = ['molecule name', 'command line', 'job type', 'cost (cpu*hr)', 'opt cycles', 'SCF iterations']
+    timing_header += [f'{module} (s)' for module in modules]
+    timing_table = []
+    rollup = {}
+    for source, row, details in timing_entries:
+        name, commands, job_type, cost = row[0], row[1], row[2], row[4]
+        cycles = details['cycles'] if job_type != 'SP' else ''
+        timings = [details['timings'].get(module, '') for module in modules]
+        timing_table.append(([source] if campaign else []) + [name, commands, job_type, cost, cycles, details['scf iterations']] + timings)
+
+        totals = rollup.setdefault(commands, {'jobs': 0, 'costed': 0, 'cost': 0.0, 'cycles': 0, 'scf iterations': 0,
+                                              'modules': dict.fromkeys(modules, 0.0)})
+        totals['jobs'] += 1
+        totals['cycles'] += details['cycles']
+        totals['scf iterations'] += details['scf iterations']
+        if cost != 'N/A':
+            totals['costed'] += 1
+            totals['cost'] += cost
+            module_time = sum(details['timings'].values())
+            for module, seconds in details['timings'].items():
+                if module_time > 0:
+                    totals['modules'][module] += cost * seconds / module_time
+    if campaign:
+        timing_header = ['source directory'] + timing_header
+
+    with open(f'{file_prefix}_timings.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows([script_info, timing_header] + timing_table)
+
+    total_cost = sum(totals['cost'] for totals in rollup.values())
+    rollup_header = ['command line', 'jobs', 'cost (cpu*hr)', 'share of cost (%)', 'cost per job (cpu*hr)',
+                     'opt cycles per job', 'SCF iterations per job'] + [f'{module} (cpu*hr)' for module in modules]
+    rollup_table = []
+    for commands, totals in sorted(rollup.items(), key=lambda item: -item[1]['cost']):
+        share = 100 * totals['cost'] / total_cost if total_cost > 0 else ''
+        per_job = totals['cost'] / totals['costed'] if totals['costed'] else 'N/A'
+        rollup_table.append([commands, totals['jobs'], totals['cost'], share, per_job,
+                             totals['cycles'] / totals['jobs'], totals['scf iterations'] / totals['jobs']]
+                            + [totals['modules'][module] for module in modules])
+
+    with open(f'{file_prefix}_cost_by_settings.csv', 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows([script_info, rollup_header] + rollup_table)
+    print(f'Timing files {file_prefix}_timings.csv and {file_prefix}_cost_by_settings.csv created.')
+
+def read_hess_file(filename):
+    """
+    Reads an orca .hess file (archived or not) into numpy arrays.
+    Returns (elements, masses, coordinates, frequencies, normal_modes), where coordinates are in angstroms with shape (atoms, 3),
+    frequencies are in cm^-1 and the columns of normal_modes (shape (3*atoms, 3*atoms)) are the cartesian displacements of each mode.
+    """
+    import numpy as np
+
+    with open_output(filename) as file:
+        lines = file.read().splitlines()
+    sections = {line.strip(): n for n, line in enumerate(lines) if line.startswith('$')}
+
+    #$atoms: element, mass and coordinates in bohr
+    start = sections['$atoms']
+    n_atoms = int(lines[start + 1])
+    atoms = [line.split() for line in lines[start + 2:start + 2 + n_atoms]]
+    elements = [atom[0] for atom in atoms]
+    masses = np.array([float(atom[1]) for atom in atoms])
+    coordinates = np.array([[float(x) for x in atom[2:5]] for atom in atoms]) * BOHR_TO_ANGSTROM
+
+    #$vibrational_frequencies: index and frequency
+    start = sections['$vibrational_frequencies']
+    n_modes = int(lines[start + 1])
+    frequencies = np.array([float(line.split()[1]) for line in lines[start + 2:start + 2 + n_modes]])
+
+    #$normal_modes: blocks of a few columns, each headed by the column indices and followed by one line per row
+    start = sections['$normal_modes']
+    n_rows, n_columns = (int(size) for size in lines[start + 1].split())
+    normal_modes = np.zeros((n_rows, n_columns))
+    n = start + 2
+    while n < len(lines) and not lines[n].startswith('$'):
+        columns = [int(column) for column in lines[n].split()]
+        if not columns:
+            n += 1
+            continue
+        block = np.array([line.split()[1:] for line in lines[n + 1:n + 1 + n_rows]], dtype=float)
+        normal_modes[:, columns] = block
+        n += 1 + n_rows
+
+    return elements, masses, coordinates, frequencies, normal_modes
+
+def mode_frames(coordinates, normal_modes, modes):
+    """
+    Returns the displaced geometries of one period of each mode, with shape (modes, ANIMATION_FRAMES, atoms, 3).
+    Every mode is scaled so its largest atomic displacement is ANIMATION_AMPLITUDE, and all frames are computed at once.
+    """
+    import numpy as np
+
+    n_atoms = len(coordinates)
+    vectors = normal_modes[:, modes].T.reshape(len(modes), n_atoms, 3)
+    largest = np.linalg.norm(vectors, axis=2).max(axis=1)
+    vectors = vectors * (ANIMATION_AMPLITUDE / np.where(largest > 0, largest, 1))[:, None, None]
+    phases = np.sin(2 * np.pi * np.arange(ANIMATION_FRAMES) / ANIMATION_FRAMES)
+    return coordinates[None, None, :, :] + phases[None, :, None, None] * vectors[:, None, :, :]
+
+def write_molecule_animations(task):
+    """
+    Writes the animation of each of the given modes of one molecule to {hess file}.v{mode:03d}.xyz (a multi-frame .xyz file).
+    task is (hess_filename, modes). Returns (hess_filename, files written, error), where error is None on success.
+    """
+    hess_filename, modes = task
+    try:
+        elements, masses, coordinates, frequencies, normal_modes = read_hess_file(hess_filename)
+        frames = mode_frames(coordinates, normal_modes, modes)
+        written = []
+        for mode, mode_frames_ in zip(modes, frames):
+            animation = f'{os.path.basename(strip_compression(hess_filename))}.v{mode:03d}.xyz'
+            with open(animation, 'w') as file:
+                for frame in mode_frames_:
+                    file.write(f'{len(elements)}\nmode {mode} ({frequencies[mode]:.2f} cm**-1)\n')
+                    file.writelines(f'{element:2} {x:12.6f} {y:12.6f} {z:12.6f}\n' for element, (x, y, z) in zip(elements, frame))
+            written.append(animation)
+        return hess_filename, written, None
+    except Exception as error:
+        return hess_filename, [], f'{type(error).__name__}: {error}'
+
+def find_hess_file(molecule_name):
+    """returns the path of a molecule's .hess file in the working directory or job_files/, preferring it uncompressed, or None"""
+    for extension in [''] + [extension for extension, codec in ARCHIVE_CODECS.values()]:
+        for directory in ('.', 'job_files'):
+            hess_filename = os.path.normpath(os.path.join(directory, f'{molecule_name}.hess{extension}'))
+            if os.path.exists(hess_filename):
+                return hess_filename
+    return None
+
+def write_neg_freq_animations(neg_freq_info, workers=1):
+    """
+    Writes the animations of every negative frequency in neg_freq_info ([molecule_name, mode] pairs) to the working directory.
+    The .hess files are read from the working directory or job_files/ (see find_hess_file), and each molecule is handled by one task,
+    either serially or on a pool of workers.
+    Returns False, without writing anything, if numpy is not available.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return False
+
+    modes = {}
+    for molecule_name, mode in neg_freq_info:
+        modes.setdefault(molecule_name, []).append(int(mode))
+    tasks = []
+    for molecule_name, molecule_modes in modes.items():
+        hess_filename = find_hess_file(molecule_name)
+        if hess_filename is not None:
+            tasks.append((hess_filename, molecule_modes))
+        else:
+            print(f'Error! {molecule_name}.hess was not found. Its negative frequencies cannot be visualized.')
+
+    if workers == 0:
+        workers = os.cpu_count()
+    if workers == 1 or len(tasks) < 2:
+        results = [write_molecule_animations(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(write_molecule_animations, tasks))
+
+    n_written = 0
+    for hess_filename, written, error in results:
+        if error is not None:
+            print(f'Error! Could not visualize the negative frequencies of {hess_filename} ({error}).')
+        n_written += len(written)
+    print(f'There are {len(neg_freq_info)} negative frequencies. {n_written} animations written (*.hess.v*.xyz).')
+    return True
+
+def neg_freq_file(neg_freq_info, job_name):
+    """writes the .sh file for visualizing negative frequencies if there are any
+    Will prevent running the file outside of sbatch if there are excessive negative frequencies
+    Archived .hess files are decompressed for orca_pltvib and the copies are removed afterwards"""
+    
+    MAX_LENGTH = 10    
+
+    archived = {}
+    for molecule_name, mode in neg_freq_info:
+        hess_filename = find_hess_file(molecule_name)
+        if hess_filename is not None and strip_compression(hess_filename) != hess_filename:
+            archived[molecule_name] = hess_filename
+
+    def decompress_lines(directory, prefix=''):
+        lines = ''
+        for molecule_name, hess_filename in archived.items():
+            tool = 'xz' if hess_filename.endswith('.xz') else 'gzip'
+            lines += f'{prefix}{tool} -dc {hess_filename} > {directory}{molecule_name}.hess\n'
+        return lines
+
+    def remove_lines(directory, prefix=''):
+        return ''.join(f'{prefix}rm {directory}{molecule_name}.hess\n' for molecule_name in archived)
+          
+    if len(neg_freq_info) < MAX_LENGTH:
+        orca_pltvib = decompress_lines('')
+        for row in neg_freq_info:
+            orca_pltvib += f'orca_pltvib {row[0]}.hess {row[1]}\n'
+        orca_pltvib += remove_lines('')
+        
+        shell_file = f"""#!/bin/bash
+module purge
+module use /project/carrow/downloads/apps/modules
+module add orca
+
+echo "There are {len(neg_freq_info)} negative frequencies.
+Executing neg_freqs.sh"
+
+{orca_pltvib}
+#This shell file was created with {os.path.basename(__file__)} and extracted from {job_name}/'
+"""
+    else:
+        orca_pltvib = decompress_lines('job_files/', '    ')
+        for row in neg_freq_info:
+            orca_pltvib += f'    orca_pltvib job_files/{row[0]}.hess {row[1]}\n'
+        orca_pltvib += remove_lines('job_files/', '    ')
+        orca_pltvib += '    mv job_files/*.hess.v* .'
+    
+        shell_file = f"""#!/bin/bash
+#SBATCH -J neg_freqs
+#SBATCH -t 1:00:00
+#SBATCH -N 1
+#SBATCH --ntasks-per-node=1
+
+#checks if job is running through SLURM
+if [ -n "$SLURM_JOB_ID" ]; then
+
+    module purge
+    module use /project/carrow/downloads/apps/modules
+    module add orca
+
+{orca_pltvib}
+else
+    echo "Warning: Excessive negative frequencies ({len(neg_freq_info)}) detected. 
+Please run this job through SLURM with sbatch neg_freqs.sh"
+    exit 0
+fi
+        
+#This shell file was created with {os.path.basename(__file__)} and extracted from {job_name}/'
+"""
+    
+    return shell_file
+
+def process_out_files(workers=1, use_cache=True, clear_cache=False, db_path=None, model_path=None, pltvib=False, npz=False,
+                      result_cache=None, thermo=None):
+    """
+    Processes Orca .out files in the current directory and creates a summary CSV file.
+    Also writes an animation of each negative frequency, or a .sh file which will visualize them with orca_pltvib
+    if pltvib is True or numpy is not available.
+    The .out files are parsed on a pool of worker processes if workers != 1,
+    and unchanged files are taken from the parse cache if use_cache is True.
+    If db_path is given, the rows are also upserted into that SQLite database.
+    If model_path is given, the resource model is fitted to these outputs and saved there.
+    If npz is True, the final geometries and frequencies are also written to {job_name}_geometries.npz.
+    If result_cache is given, the normally terminated jobs are added to the result cache in that directory.
+    If thermo is given as (temperatures, concentrations, cutoffs), the thermochemistry is recomputed at each of them.
+    """
+    #initializes results table
+    script_info = [f'This table was compiled with {os.path.basename(__file__)} and extracted from {job_name}/']
+    table_header = ['molecule name', 'command line', 'job type', 'freq?', 'cost (cpu*hr)', 'E (a.u.)', 'H (a.u.)', 'G (a.u.)', 'neg freq (cm^-1)', 'geom converged?']
+    results_table = []
+    neg_freq_info = []
+    training = []
+    timing_entries = []
+    parsed_files = []
+
+    for filename, parsed, error in parse_directory('.', workers, use_cache, clear_cache):
+        if error is not None:
+            print(f'Error! Could not parse {filename} ({error}). Skipping this file.')
+            continue
+        rows, file_neg_freq_info, file_details = parsed
+        parsed_files.append(('.', filename, rows))
+
+        results_table += rows
+        neg_freq_info += file_neg_freq_info
+        training += zip(rows, file_details)
+        timing_entries += [(None, row, details) for row, details in zip(rows, file_details)]
+    
+    #writes the .csv file with results
+    with open(f'{job_name}_summary.csv', 'w', newline='') as file1:
+        writer = csv.writer(file1)
+        writer.writerows([script_info, table_header] + results_table)
+    print(f'Summary file {job_name}_summary.csv created.')
+    write_timing_tables(job_name, timing_entries, script_info)
+    if thermo is not None:
+        write_thermochemistry_table(job_name, timing_entries, script_info, *thermo)
+
+    if db_path is not None:
+        store_results(db_path, [('.', row) for row in results_table], ['.'])
+
+    if model_path is not None:
+        fit_resource_model(training, model_path)
+
+    if npz:
+        write_geometry_store(f'{job_name}_geometries.npz', training)
+
+    if result_cache is not None:
+        publish_results(result_cache, parsed_files)
+    
+    #writes the animations of the negative frequencies, or the .sh file for visualizing them, if there are any
+    if neg_freq_info != [] and not pltvib and write_neg_freq_animations(neg_freq_info, workers):
+        #a neg_freqs.sh left from a previous run would visualize them again
+        if os.path.exists('neg_freqs.sh'):
+            os.remove('neg_freqs.sh')
+    elif neg_freq_info != []:
+        shell_file = neg_freq_file(neg_freq_info, job_name)
+        with open(f'neg_freqs.sh', 'w') as file2:
+            file2.writelines(shell_file)
+        
+def aggregate_campaign(workers=1, use_cache=True, clear_cache=False, db_path=None, model_path=None, npz=False, result_cache=None,
+                       thermo=None):
+    """
+    Walks the working directory tree and creates one summary CSV of every orca .out file found in it.
+    The first column records the directory each row came from.
+    Directories whose .out files are unchanged since the last aggregation are taken from CAMPAIGN_CACHE_FILE
+    without being opened; the remaining directories are parsed together on one pool of workers.
+    Directories with a file that could not be parsed are left out of CAMPAIGN_CACHE_FILE, so that file is retried on every run.
+    neg_freqs.sh is not written, since the .hess files are spread over many directories.
+    If db_path is given, the rows are also upserted into that SQLite database.
+    If model_path is given, the resource model is fitted to these outputs and saved there.
+    If npz is True, each directory gets its own {directory}_geometries.npz, which is only rewritten if the directory changed.
+    If result_cache is given, the normally terminated jobs are added to the result cache in that directory.
+    If thermo is given as (temperatures, concentrations, cutoffs), the thermochemistry is recomputed at each of them.
+    """
+    directories = find_out_directories('.')
+
+    campaign_cache = {}
+    if use_cache and not clear_cache:
+        campaign_cache = load_cache('.', CAMPAIGN_CACHE_FILE)
+
+    signatures = {directory: directory_signature(directory) for directory in directories}
+    changed = [directory for directory in directories
+               if directory not in campaign_cache or campaign_cache[directory]['signature'] != signatures[directory]]
+    print(f'Found {len(directories)} directories with .out files. {len(changed)} changed since the last aggregation.')
+
+    parsed_directories = parse_directories(changed, workers, use_cache, clear_cache)
+
+    #initializes results table
+    script_info = [f'This table was compiled with {os.path.basename(__file__)} and extracted from every directory under {job_name}/']
+    table_header = ['source directory', 'molecule name', 'command line', 'job type', 'freq?', 'cost (cpu*hr)', 'E (a.u.)', 'H (a.u.)', 'G (a.u.)', 'neg freq (cm^-1)', 'geom converged?']
+    results_table = []
+    training = []
+    timing_entries = []
+    parsed_files = []
+    new_campaign_cache = {}
+
+    for directory in directories:
+        if directory in parsed_directories:
+            entries = parsed_directories[directory]
+        else:
+            entries = campaign_cache[directory]['entries']
+        #a directory with a file that could not be parsed is not cached, so the file is retried on the next run (see parse_directories)
+        if all(error is None for filename, parsed, error in entries):
+            new_campaign_cache[directory] = {'signature': signatures[directory], 'entries': entries}
+
+        directory_training = []
+        for filename, parsed, error in entries:
+            if error is not None:
+                print(f'Error! Could not parse {os.path.join(directory, filename)} ({error}). Skipping this file.')
+                continue
+            rows, file_neg_freq_info, file_details = parsed
+            parsed_files.append((directory, filename, rows))
+            results_table += [[directory] + row for row in rows]
+            directory_training += zip(rows, file_details)
+            timing_entries += [(directory, row, details) for row, details in zip(rows, file_details)]
+        training += directory_training
+
+        if npz:
+            store_path = os.path.join(directory, f'{os.path.basename(os.path.abspath(directory))}_geometries.npz')
+            if directory in parsed_directories or not os.path.exists(store_path):
+                write_geometry_store(store_path, directory_training)
+
+    if use_cache:
+        save_cache(new_campaign_cache, '.', CAMPAIGN_CACHE_FILE)
+
+    #writes the .csv file with results
+    with open(f'{job_name}_campaign_summary.csv', 'w', newline='') as file1:
+        writer = csv.writer(file1)
+        writer.writerows([script_info, table_header] + results_table)
+    print(f'Summary file {job_name}_campaign_summary.csv created.')
+    write_timing_tables(f'{job_name}_campaign', timing_entries, script_info)
+    if thermo is not None:
+        write_thermochemistry_table(f'{job_name}_campaign', timing_entries, script_info, *thermo)
+
+    if db_path is not None:
+        store_results(db_path, [(row[0], row[1:]) for row in results_table], directories)
+
+    if model_path is not None:
+        fit_resource_model(training, model_path)
+
+    if result_cache is not None:
+        publish_results(result_cache, parsed_files)
+
+def compress_file(task):
+    """
+    Compresses one file with an archive codec and removes the original. task is (path, codec name).
+    The compressed file is streamed to a temporary file that replaces nothing until it is complete, and it keeps the
+    modification time of the original. Returns (path, bytes before, bytes after, error), where error is None on success.
+    """
+    path, codec_name = task
+    extension, codec = ARCHIVE_CODECS[codec_name]
+    try:
+        before = os.path.getsize(path)
+        with open(path, 'rb') as source, codec.open(f'{path}{extension}.tmp', 'wb') as target:
+            shutil.copyfileobj(source, target, 1024*1024)
+        shutil.copystat(path, f'{path}{extension}.tmp')
+        os.replace(f'{path}{extension}.tmp', f'{path}{extension}')
+        os.remove(path)
+        return path, before, os.path.getsize(f'{path}{extension}'), None
+    except OSError as error:
+        if os.path.exists(f'{path}{extension}.tmp'):
+            os.remove(f'{path}{extension}.tmp')
+        return path, 0, 0, f'{type(error).__name__}: {error}'
+
+def archive_files(directory, entries):
+    """
+    Lists the files of a directory that can be archived: the .out files of the jobs that terminated normally with every
+    row finished and converged, and every file in job_files/ belonging to one of those jobs (named {molecule_name}.* or {molecule_name}_*).
+    entries are the (filename, parsed, error) of the directory from parse_directories.
+    Files of failed, unconverged or running jobs are left alone, since restarting them needs their .gbw and .hess files.
+    """
+    finished = []
+    for filename, parsed, error in entries:
+        if parsed is None or any(row[4] == 'N/A' or row[9] is False for row in parsed[0]):
+            continue
+        tail = read_tail(os.path.join(directory, filename))
+        if len(tail) == 2 and tail[0] == '****ORCA TERMINATED NORMALLY****':
+            finished.append(filename.split('.')[0])
+
+    paths = [os.path.join(directory, filename) for filename in list_out_files(directory)
+             if filename.endswith('.out') and filename.split('.')[0] in finished]
+    job_files = os.path.join(directory, 'job_files')
+    if os.path.isdir(job_files):
+        for entry in sorted(os.scandir(job_files), key=lambda entry: entry.name):
+            if not entry.is_file() or strip_compression(entry.name) != entry.name or entry.name.endswith('.tmp'):
+                continue
+            if any(entry.name.startswith((f'{molecule_name}.', f'{molecule_name}_')) for molecule_name in finished):
+                paths.append(entry.path)
+    return paths
+
+def archive_directories(directories, codec_name='gzip', workers=1):
+    """
+    Compresses the finished outputs and job files (see archive_files) of each directory with gzip or lzma,
+    either serially or on a pool of workers. process_orca_4 reads the archived .out and .hess files as they are,
+    so archived directories can still be summarized.
+    """
+    parsed_directories = parse_directories(directories, workers)
+    paths = [path for directory in directories for path in archive_files(directory, parsed_directories[directory])]
+    if workers == 0:
+        workers = os.cpu_count()
+    tasks = [(path, codec_name) for path in paths]
+    if workers == 1 or len(tasks) < 2:
+        results = [compress_file(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(compress_file, tasks))
+
+    total_before, total_after = 0, 0
+    for path, before, after, error in results:
+        if error is not None:
+            print(f'Error! Could not archive {path} ({error}).')
+        total_before += before
+        total_after += after
+    archived = sum(error is None for path, before, after, error in results)
+    print(f'{archived} files archived with {codec_name}: {total_before / 1e6:.1f} MB -> {total_after / 1e6:.1f} MB')
+
+def parse_arguments():
+    """reads the optional command line arguments"""
+    parser = argparse.ArgumentParser(description='Summarizes the orca 4.2.1 .out files in the working directory.')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of processes used to parse .out files (0 uses every available core)')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='summarizes every directory under the working directory into one campaign summary')
+    parser.add_argument('--sqlite', metavar='DB', dest='db_path',
+                        help='also upserts every row into the results table of this SQLite database')
+    parser.add_argument('--fit-model', metavar='PATH', dest='model_path',
+                        help='fits the launch_orca_4 resource model to the normally terminated outputs and saves it to PATH')
+    parser.add_argument('--watch', metavar='SECONDS', type=float, nargs='?', const=60,
+                        help='reports the progress of the running jobs every SECONDS (default 60) instead of summarizing them')
+    parser.add_argument('--npz', action='store_true',
+                        help='also writes the final geometries and frequencies to a memory-mappable {directory}_geometries.npz')
+    parser.add_argument('--result-cache', metavar='DIR', nargs='?', dest='result_cache',
+                        const=os.path.join(os.environ.get('CARROW_CODEBASE', '.'), 'result_cache'),
+                        help='adds the normally terminated jobs to the result cache used by launch_orca_4 cache (default $CARROW_CODEBASE/result_cache)')
+    parser.add_argument('--archive', metavar='CODEC', nargs='?', const='gzip', choices=sorted(ARCHIVE_CODECS),
+                        help='compresses the outputs and job_files of the finished jobs with gzip (default) or lzma instead of summarizing them')
+    parser.add_argument('--thermo', action='store_true',
+                        help='recomputes H and G of the freq jobs at every --temperatures, --concentrations and --qrrho cutoff')
+    parser.add_argument('--temperatures', metavar='K', type=float, nargs='+', default=[298.15],
+                        help='temperatures for --thermo (default 298.15)')
+    parser.add_argument('--concentrations', metavar='C', nargs='+', default=['atm'],
+                        help="standard states for --thermo: 'atm' or a concentration in mol/L (default atm)")
+    parser.add_argument('--qrrho', metavar='CM-1', type=float, nargs='+', default=[0, 100],
+                        help='quasi-RRHO cutoffs for --thermo, 0 being the plain RRHO (default 0 100)')
+    parser.add_argument('--pltvib', action='store_true',
+                        help='writes neg_freqs.sh for orca_pltvib instead of writing the negative frequency animations directly')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='ignores the parse caches and parses every .out file again')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='neither reads nor writes the parse caches')
+    args = parser.parse_args()
+    for concentration in args.concentrations:
+        if concentration != 'atm' and (to_number(concentration) is None or to_number(concentration) <= 0):
+            parser.error(f"--concentrations takes 'atm' or a positive concentration in mol/L, not {concentration}")
+    return args
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    job_name = os.path.basename(os.getcwd())
+    thermo = (args.temperatures, args.concentrations, args.qrrho) if args.thermo else None
+    if args.watch is not None:
+        watch_out_files(args.watch)
+    elif args.archive is not None:
+        archive_directories(find_out_directories('.') if args.recursive else ['.'], args.archive, args.workers)
+    elif args.recursive:
+        aggregate_campaign(args.workers, not args.no_cache, args.clear_cache, args.db_path, args.model_path, args.npz, args.result_cache,
+                           thermo)
+    else:
+        process_out_files(args.workers, not args.no_cache, args.clear_cache, args.db_path, args.model_path, args.pltvib, args.npz,
+                          args.result_cache, thermo)
@@ -0,0 +1,383 @@
+"""
+This script calculates the sterimol descriptors (L, B1 and B5) of many geometries and bond axes at once.
+It reads a table of jobs, one (file, atom1, atom2) per row, and calculates every job with each of the requested radius models.
+The geometry of all jobs is calculated together with numpy (the jobs are split into chunks that run on several processes with -j),
+rather than once per file as with 'python -m sterimol'.
+
+The job table is a .csv file with the columns file, atom1 and atom2 (and an optional radii column, which overrides --radii for that row).
+The atoms are numbered from 1, as for sterimol -a1/-a2, and the axis points from atom1 to atom2.
+The file can be an .xyz file (the last frame is used, so _trj.xyz files work) or an orca .out file (the last coordinates are used),
+and can be a pattern (e.g. *.out) to apply one axis to many files. Outputs archived by process_orca_4 --archive (.out.gz or .out.xz)
+are decompressed as they are read, so a pattern such as *.out.gz covers an archived directory.
+e.g.
+    file,atom1,atom2
+    *.out,1,2
+    PPh3_0_1.xyz,1,2,bondi
+
+atom1 is the attachment point and is not part of the substituent, so it is left out of L, B1 and B5. Every other atom is included.
+L is the length of the substituent along the axis from atom1, including the 0.40 angstrom correction of the original program.
+B5 is its largest width perpendicular to the axis, and B1 is its smallest width, found by scanning every 0.5 degrees around the axis.
+The radii are those of Paton's sterimol. The cpk radii belong to Verloop's atom types, which tell apart C, N, O and S atoms by their
+coordination number (counted as in Grimme's D3), and the bondi radii are per element (H 1.09, as in the original program).
+
+The results are written to {directory}_sterimol.csv (molecule name, file, atom 1, atom 2, radii, L, B1, B5).
+The molecule name is the name of the file without its extension, as in the process_orca_4 summary, so the two tables can be joined.
+Files with several jobs ($new_job) have one summary row per job, named {molecule name}_job{n}; strip the _job{n} before joining.
+The sterimol_results view of the SQLite database does this.
+
+Optional arguments:
+    --radii MODEL [MODEL ...]   radius models used for every row without a radii column: cpk, bondi or both (default cpk)
+    -j N, --workers N           calculates the chunks of jobs on N processes at once (use -j 0 for every available core)
+    -o PATH, --output PATH      the .csv file written (default {directory}_sterimol.csv)
+    --sqlite DB                 also upserts the results into the 'sterimol' table of the SQLite database DB.
+                                It has the source directory and molecule name of the 'results' table of process_orca_4 --sqlite,
+                                and the 'sterimol_results' view joins the two (matching {molecule name}_job{n} rows too).
+                                The view is only created once the database has a 'results' table, so run with --sqlite again
+                                after process_orca_4 --sqlite if the sterimol table was stored first.
+"""
+
+#####################
+###Version Control###
+#####################
+
+#(since I will probably not convince the Carrow lab to use Github)
+#Update this value whenever edits are made and add to the Edit History comment.
+
+edit_history = """
+Version Initials    Date            Summary
+1.0     ARS         17-Oct-2026     First draft of batch sterimol over a table of files and bond axes
+1.1     ARS         17-Oct-2026     L includes the 0.40 angstrom correction and the radii are those of the original program (cpk by atom type). Added the sterimol_results view
+1.2     ARS         17-Oct-2026     reads archived .out.gz and .out.xz files. The sterimol_results view is only created when the database has a results table
+"""
+
+import os
+import csv
+import glob
+import gzip
+import lzma
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+#radii in angstroms. The cpk radii are by Verloop's atom type (see atom_types) and by element for the elements without types
+RADII = {
+    'cpk': {'H': 1.00, 'C': 1.50, 'C3': 1.60, 'C6/N6': 1.70, 'N': 1.50, 'O': 1.35, 'O2': 1.35, 'S': 1.70, 'S4': 1.40, 'S1': 1.00,
+            'B': 1.80, 'F': 1.35, 'Si': 2.10, 'P': 1.40, 'Cl': 1.80, 'Ge': 2.10, 'As': 2.00, 'Se': 2.00, 'Br': 1.95, 'Sn': 2.20,
+            'Te': 2.20, 'I': 2.15},
+    'bondi': {'H': 1.09, 'He': 1.40, 'Li': 1.82, 'B': 1.92, 'C': 1.70, 'N': 1.55, 'O': 1.52, 'F': 1.47, 'Ne': 1.54,
+              'Na': 2.27, 'Mg': 1.73, 'Al': 1.84, 'Si': 2.10, 'P': 1.80, 'S': 1.80, 'Cl': 1.75, 'Ar': 1.88, 'K': 2.75,
+              'Ni': 1.63, 'Cu': 1.40, 'Zn': 1.39, 'Ga': 1.87, 'Ge': 2.11, 'As': 1.85, 'Se': 1.90, 'Br': 1.85, 'Kr': 2.02,
+              'Pd': 1.63, 'Ag': 1.72, 'Cd': 1.58, 'In': 1.93, 'Sn': 2.17, 'Sb': 2.06, 'Te': 2.06, 'I': 1.98, 'Xe': 2.16,
+              'Pt': 1.75, 'Au': 1.66, 'Hg': 1.55, 'Tl': 1.96, 'Pb': 2.02}}
+#used for elements missing from a radius model
+DEFAULT_RADIUS = 2.00
+#added to L, as in the original program
+L_CORRECTION = 0.40
+#covalent radii (Pyykko) for the coordination numbers of the cpk atom types
+COVALENT_RADII = {'H': 0.32, 'B': 0.85, 'C': 0.75, 'N': 0.71, 'O': 0.63, 'F': 0.64, 'Si': 1.16, 'P': 1.11, 'S': 1.03, 'Cl': 0.99,
+                  'Ge': 1.21, 'As': 1.21, 'Se': 1.16, 'Br': 1.14, 'Sn': 1.40, 'Te': 1.36, 'I': 1.33}
+DEFAULT_COVALENT_RADIUS = 1.50
+#B1 is the smallest of the widths at this many angles around the axis (every 0.5 degrees)
+N_ANGLES = 720
+#the largest number of (job, atom, angle) widths held in memory at once by one process
+CHUNK_SIZE = 2000000
+#the archives written by process_orca_4 --archive, which are decompressed as they are read
+ARCHIVE_CODECS = {'.gz': gzip, '.xz': lzma}
+
+def strip_compression(filename):
+    """returns a filename without the extension of an archive codec (e.g. x.out.gz -> x.out)"""
+    for extension in ARCHIVE_CODECS:
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+def read_geometry(filename):
+    """
+    Reads the last geometry of an .xyz file (which may have several frames) or an orca .out file.
+    Archived files (.gz or .xz) are decompressed as they are read.
+    Returns (elements, coordinates), where coordinates is a list of [x, y, z] in angstroms.
+    """
+    codec = ARCHIVE_CODECS.get(os.path.splitext(filename)[1])
+    with (codec.open(filename, 'rt') if codec is not None else open(filename, 'r')) as file:
+        lines = file.read().splitlines()
+
+    elements, coordinates = [], []
+    if strip_compression(filename).endswith('.out'):
+        #the last CARTESIAN COORDINATES (ANGSTROEM) block is the final geometry
+        starts = [n for n, line in enumerate(lines) if line.strip() == 'CARTESIAN COORDINATES (ANGSTROEM)']
+        if not starts:
+            raise ValueError('no coordinates found')
+        for line in lines[starts[-1] + 2:]:
+            fields = line.split()
+            if len(fields) != 4:
+                break
+            elements.append(fields[0])
+            coordinates.append([float(x) for x in fields[1:]])
+    else:
+        #each frame is a count line, a comment line and one line per atom
+        n = 0
+        while n < len(lines) and lines[n].strip():
+            n_atoms = int(lines[n])
+            frame = [line.split() for line in lines[n + 2:n + 2 + n_atoms]]
+            elements = [fields[0] for fields in frame]
+            coordinates = [[float(x) for x in fields[1:4]] for fields in frame]
+            n += 2 + n_atoms
+    if not elements:
+        raise ValueError('no coordinates found')
+    return elements, coordinates
+
+def molecule_name(filename):
+    """names a geometry after its file, as the process_orca_4 summary names the .out file of the same molecule"""
+    name = os.path.splitext(os.path.basename(strip_compression(filename)))[0]
+    if name.endswith('_trj'):
+        name = name[:-4]
+    return name
+
+def atom_types(elements, coordinates):
+    """
+    Assigns Verloop's atom types as Paton's sterimol does, from the coordination number of each atom.
+    The coordination number counts the neighbours of an atom with the damping function of Grimme's D3 (k1 = 16, k2 = 4/3).
+    C is C3 (sp), C6/N6 (sp2) or C (sp3), N is C6/N6 or N, O is O2 or O and S is S, S4 or S1. Other atoms keep their element.
+    """
+    import numpy as np
+
+    positions = np.array(coordinates)
+    covalent = np.array([COVALENT_RADII.get(element, DEFAULT_COVALENT_RADIUS) for element in elements])
+    distances = np.linalg.norm(positions[:, None, :] - positions[None, :, :], axis=2)
+    np.fill_diagonal(distances, 1.0)
+    counts = 1 / (1 + np.exp(-16 * (4/3 * (covalent[:, None] + covalent[None, :]) / distances - 1)))
+    np.fill_diagonal(counts, 0)
+    coordination = counts.sum(axis=1)
+
+    types = []
+    for element, cn in zip(elements, coordination.tolist()):
+        if element == 'C':
+            types.append('C' if cn > 3.5 else 'C6/N6' if cn > 2.5 else 'C3')
+        elif element == 'N':
+            types.append('N' if cn > 2.5 else 'C6/N6')
+        elif element == 'O':
+            types.append('O' if cn > 1.5 else 'O2')
+        elif element == 'S':
+            types.append('S1' if cn > 5.5 else 'S4' if cn > 2.5 else 'S')
+        else:
+            types.append(element)
+    return types
+
+def read_job_table(filename, default_radii):
+    """
+    Reads the job table and returns a list of (file, atom1, atom2, radii) jobs, one per file and radius model.
+    Patterns in the file column are expanded. Rows that match no file or name an unknown radius model are skipped with an error.
+    """
+    jobs = []
+    with open(filename, 'r', newline='') as file:
+        for n, row in enumerate(csv.DictReader(file), 2):
+            pattern = (row.get('file') or '').strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            try:
+                atom1, atom2 = int(row['atom1']), int(row['atom2'])
+            except (TypeError, ValueError):
+                print(f'Error! Line {n} of {filename} does not have valid atom1 and atom2 numbers. It will be skipped.')
+                continue
+            radii_models = [row['radii'].strip()] if (row.get('radii') or '').strip() else default_radii
+            unknown = [radii for radii in radii_models if radii not in RADII]
+            if unknown:
+                print(f'Error! Line {n} of {filename} uses the unknown radius model {unknown[0]}. It will be skipped.')
+                continue
+            files = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+            if not files:
+                print(f'Error! No file matches {pattern} (line {n} of {filename}).')
+            for geometry_file in files:
+                for radii in radii_models:
+                    jobs.append((geometry_file, atom1, atom2, radii))
+    return jobs
+
+def sterimol_chunk(chunk):
+    """
+    Calculates L, B1 and B5 of a chunk of jobs with numpy, all at once.
+    chunk is a list of (radii, coordinates, atom1, atom2), where radii holds the radius of each atom. The atoms of every job
+    are padded to the largest job of the chunk, and the padding is masked out. Returns a list of (L, B1, B5).
+    """
+    import numpy as np
+
+    n_jobs = len(chunk)
+    n_atoms = max(len(coordinates) for radii, coordinates, atom1, atom2 in chunk)
+    positions = np.zeros((n_jobs, n_atoms, 3))
+    atom_radii = np.zeros((n_jobs, n_atoms))
+    included = np.zeros((n_jobs, n_atoms), dtype=bool)
+    origins = np.zeros((n_jobs, 3))
+    axes = np.zeros((n_jobs, 3))
+    for j, (radii, coordinates, atom1, atom2) in enumerate(chunk):
+        positions[j, :len(coordinates)] = coordinates
+        atom_radii[j, :len(coordinates)] = radii
+        included[j, :len(coordinates)] = True
+        included[j, atom1 - 1] = False
+        origins[j] = coordinates[atom1 - 1]
+        axes[j] = np.subtract(coordinates[atom2 - 1], coordinates[atom1 - 1])
+    axes /= np.linalg.norm(axes, axis=1)[:, None]
+
+    #two unit vectors perpendicular to each axis, starting from whichever cartesian axis is least parallel to it
+    reference = np.eye(3)[np.argmin(np.abs(axes), axis=1)]
+    perpendicular1 = np.cross(axes, reference)
+    perpendicular1 /= np.linalg.norm(perpendicular1, axis=1)[:, None]
+    perpendicular2 = np.cross(axes, perpendicular1)
+
+    relative = positions - origins[:, None, :]
+    along = np.einsum('jak,jk->ja', relative, axes)
+    x = np.einsum('jak,jk->ja', relative, perpendicular1)
+    y = np.einsum('jak,jk->ja', relative, perpendicular2)
+
+    L = np.where(included, along + atom_radii, -np.inf).max(axis=1) + L_CORRECTION
+    B5 = np.where(included, np.hypot(x, y) + atom_radii, -np.inf).max(axis=1)
+    #the width in each direction around the axis is the furthest any atom reaches in that direction
+    angles = np.linspace(0, 2*np.pi, N_ANGLES, endpoint=False)
+    widths = x[:, :, None]*np.cos(angles) + y[:, :, None]*np.sin(angles) + atom_radii[:, :, None]
+    B1 = np.where(included[:, :, None], widths, -np.inf).max(axis=1).min(axis=1)
+
+    return list(zip(L.tolist(), B1.tolist(), B5.tolist()))
+
+def calculate_sterimol(jobs, workers=1):
+    """
+    Calculates every (file, atom1, atom2, radii) job. Each file is read once however many axes and radius models use it.
+    Returns a list of (job, (L, B1, B5)) in the order of jobs. Jobs whose file cannot be read or whose atoms are not
+    in the file are skipped with an error.
+    """
+    geometries = {}
+    types = {}
+    valid_jobs, inputs = [], []
+    for job in jobs:
+        filename, atom1, atom2, radii = job
+        if filename not in geometries:
+            try:
+                geometries[filename] = read_geometry(filename)
+            except (OSError, ValueError, IndexError) as error:
+                print(f'Error! {filename} could not be read ({error}). It will be skipped.')
+                geometries[filename] = None
+        if geometries[filename] is None:
+            continue
+        elements, coordinates = geometries[filename]
+        if not (1 <= atom1 <= len(elements) and 1 <= atom2 <= len(elements)) or atom1 == atom2:
+            print(f'Error! {filename} has {len(elements)} atoms, so atoms {atom1} and {atom2} do not define an axis. It will be skipped.')
+            continue
+        if radii == 'cpk' and filename not in types:
+            types[filename] = atom_types(elements, coordinates)
+        labels = types[filename] if radii == 'cpk' else elements
+        valid_jobs.append(job)
+        inputs.append(([RADII[radii].get(label, DEFAULT_RADIUS) for label in labels], coordinates, atom1, atom2))
+
+    #similar sizes are chunked together so that little of each chunk is padding
+    order = sorted(range(len(inputs)), key=lambda n: len(inputs[n][0]))
+    chunks, chunk = [], []
+    for n in order:
+        chunk.append(n)
+        if (len(chunk) + 1) * len(inputs[n][0]) * N_ANGLES > CHUNK_SIZE:
+            chunks.append(chunk)
+            chunk = []
+    if chunk:
+        chunks.append(chunk)
+
+    if workers == 0:
+        workers = os.cpu_count()
+    tasks = [[inputs[n] for n in chunk] for chunk in chunks]
+    if workers == 1 or len(tasks) < 2:
+        chunk_results = [sterimol_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_results = list(executor.map(sterimol_chunk, tasks))
+
+    results = [None] * len(inputs)
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        for n, descriptors in zip(chunk, chunk_result):
+            results[n] = descriptors
+    return list(zip(valid_jobs, results))
+
+STERIMOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sterimol (
+    source_directory TEXT NOT NULL,
+    molecule_name TEXT NOT NULL,
+    file TEXT,
+    atom1 INTEGER NOT NULL,
+    atom2 INTEGER NOT NULL,
+    radii TEXT NOT NULL,
+    L REAL,
+    B1 REAL,
+    B5 REAL,
+    PRIMARY KEY (source_directory, molecule_name, atom1, atom2, radii)
+);
+CREATE INDEX IF NOT EXISTS sterimol_molecule_name ON sterimol (molecule_name);
+"""
+
+#only created once process_orca_4 --sqlite has made the results table, since a view of a missing table cannot be queried
+STERIMOL_VIEW = """
+CREATE VIEW IF NOT EXISTS sterimol_results AS
+    SELECT results.*, sterimol.atom1, sterimol.atom2, sterimol.radii, sterimol.L, sterimol.B1, sterimol.B5
+    FROM results JOIN sterimol ON sterimol.source_directory = results.source_directory
+        AND (results.molecule_name = sterimol.molecule_name
+             OR (substr(results.molecule_name, 1, length(sterimol.molecule_name) + 4) = sterimol.molecule_name || '_job'
+                 AND substr(results.molecule_name, length(sterimol.molecule_name) + 5) GLOB '[0-9]*'));
+"""
+
+def source_directory(filename):
+    """the directory process_orca_4 would record for this file, i.e. the batch directory rather than its inputs/ or job_files/"""
+    directory = os.path.dirname(os.path.abspath(filename))
+    if os.path.basename(directory) in ('inputs', 'job_files'):
+        directory = os.path.dirname(directory)
+    return directory
+
+def store_sterimol(db_path, results):
+    """
+    Upserts the results into the sterimol table of an SQLite database, creating it if needed.
+    Rows are keyed by source directory, molecule name, axis and radius model, so rerunning replaces the old rows.
+    The sterimol_results view joins them to the results of process_orca_4 --sqlite, stripping the _job{n} of files with several jobs.
+    It is created once the database has a results table.
+    e.g. SELECT molecule_name, G, L, B1, B5 FROM sterimol_results WHERE radii = 'cpk'
+    """
+    records = [(source_directory(filename), molecule_name(filename), filename, atom1, atom2, radii, L, B1, B5)
+               for (filename, atom1, atom2, radii), (L, B1, B5) in results]
+
+    #the timeout lets several runs share one database
+    connection = sqlite3.connect(db_path, timeout=60)
+    try:
+        with connection:
+            connection.executescript(STERIMOL_SCHEMA)
+            if connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'results'").fetchone():
+                connection.executescript(STERIMOL_VIEW)
+            connection.executemany('INSERT OR REPLACE INTO sterimol VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', records)
+    finally:
+        connection.close()
+    print(f'{len(records)} results stored in {db_path}')
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Calculates the sterimol descriptors of every (file, atom1, atom2) row of a job table.')
+    parser.add_argument('job_table', help='.csv file with the columns file, atom1, atom2 and optionally radii')
+    parser.add_argument('--radii', nargs='+', default=['cpk'], choices=sorted(RADII),
+                        help='radius models used for every row without a radii column (default cpk)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='calculates the chunks of jobs on N processes at once (0 uses every available core)')
+    parser.add_argument('-o', '--output', default=None, help='the .csv file written (default {directory}_sterimol.csv)')
+    parser.add_argument('--sqlite', metavar='DB', dest='db_path', default=None,
+                        help='also upserts the results into the sterimol table of this SQLite database')
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    job_name = os.path.basename(os.getcwd())
+    output = args.output or f'{job_name}_sterimol.csv'
+
+    jobs = read_job_table(args.job_table, args.radii)
+    results = calculate_sterimol(jobs, args.workers)
+
+    script_info = [f'This table was compiled with {os.path.basename(__file__)} from {args.job_table} in {job_name}/']
+    table_header = ['molecule name', 'file', 'atom 1', 'atom 2', 'radii', 'L (A)', 'B1 (A)', 'B5 (A)']
+    results_table = [[molecule_name(filename), filename, atom1, atom2, radii, round(L, 2), round(B1, 2), round(B5, 2)]
+                     for (filename, atom1, atom2, radii), (L, B1, B5) in results]
+    with open(output, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows([script_info, table_header] + results_table)
+    print(f'{len(results)} of {len(jobs)} sterimol jobs written to {output}')
+
+    if args.db_path is not None:
+        store_sterimol(args.db_path, results)
+
+if __name__ == '__main__':
+    main()